@@ -0,0 +1,68 @@
+import json
+import queue
+import socket
+import threading
+import traceback
+
+# File where every hazard alert is appended as a JSON line, None to skip it
+ALERT_LOG: str = 'alerts.log'
+# Local (host, port) that also receives every alert as a UDP datagram, None to skip it
+ALERT_ADDRESS: tuple = None
+
+alert_queue: queue.Queue = None
+alert_thread: threading.Thread = None
+
+
+def write_log(path: str, alert: dict):
+    with open(path, 'a', encoding='utf-8') as file:
+        file.write(json.dumps(alert, ensure_ascii=False) + '\n')
+
+
+def send_datagram(connection, address: tuple, alert: dict):
+    connection.sendto(json.dumps(alert, ensure_ascii=False).encode('utf-8'), address)
+
+
+def consume_alerts(alerts: queue.Queue, sinks: list):
+    alert = alerts.get()
+    while alert is not None:
+        for sink in sinks:
+            try:
+                sink(alert)
+            except Exception:
+                # A broken sink must not stop the rest of the alerts
+                traceback.print_exc()
+        alert = alerts.get()
+
+
+def start_alerts(log_path: str = ALERT_LOG, address: tuple = ALERT_ADDRESS, callback=None):
+    global alert_queue, alert_thread
+    if alert_thread is not None:
+        return
+    sinks = []
+    if log_path is not None:
+        sinks.append(lambda alert: write_log(log_path, alert))
+    if address is not None:
+        connection = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        sinks.append(lambda alert: send_datagram(connection, address, alert))
+    if callback is not None:
+        sinks.append(callback)
+    alert_queue = queue.Queue()
+    alert_thread = threading.Thread(target=consume_alerts, args=(alert_queue, sinks), name='alerts', daemon=True)
+    alert_thread.start()
+
+
+def send_alert(alert: dict):
+    if alert_queue is None:
+        start_alerts()
+    alert_queue.put(alert)
+
+
+def stop_alerts(timeout: float = 10.0):
+    """Waits until the pending alerts are delivered and stops the consumer thread."""
+    global alert_queue, alert_thread
+    if alert_thread is None:
+        return
+    alert_queue.put(None)
+    alert_thread.join(timeout)
+    alert_queue = None
+    alert_thread = None
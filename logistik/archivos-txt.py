@@ -20,4 +20,5 @@ def crear_archivos_txt():
         print("\n\tArchivo vasos.txt creado!")
 
 
-crear_archivos_txt()
+if __name__ == '__main__':
+    crear_archivos_txt()
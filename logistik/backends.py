@@ -0,0 +1,68 @@
+import os
+import cv2 as cv
+import numpy as np
+
+try:
+    import onnxruntime as ort
+except ImportError:
+    ort = None
+
+# darknet: yolov3.cfg/.weights through OpenCV DNN
+# onnx: an ONNX export of the model through OpenCV DNN
+# onnxruntime: an ONNX export of the model through ONNX Runtime, when installed
+BACKENDS: list = ['darknet', 'onnx', 'onnxruntime']
+
+
+class OnnxRuntimeNet:
+    """Runs an ONNX export through ONNX Runtime behind the calls the pipeline makes on a cv.dnn.Net.
+
+    The export is expected to keep the YOLO output layers as its outputs, with one row per candidate box.
+    """
+
+    def __init__(self, path: str, threads: int = None):
+        options = ort.SessionOptions()
+        if threads is not None:
+            options.intra_op_num_threads = threads
+            options.inter_op_num_threads = 1
+        self.session = ort.InferenceSession(path, options, providers=['CPUExecutionProvider'])
+        self.input_name = self.session.get_inputs()[0].name
+        self.output_names = [output.name for output in self.session.get_outputs()]
+        self.blob = None
+
+    def setInput(self, blob):
+        self.blob = blob
+
+    def forward(self, ln):
+        return self.session.run(ln, {self.input_name: self.blob})
+
+    def getLayerNames(self):
+        return self.output_names
+
+    def getUnconnectedOutLayers(self):
+        return np.arange(1, len(self.output_names) + 1)
+
+
+def read_network(folder_path: str, model: str, backend: str, quantized: bool = False, threads: int = None):
+    onnx_path = f"{folder_path}/{model}{'-int8' if quantized else ''}.onnx"
+    if backend == 'onnxruntime':
+        if ort is None:
+            raise ImportError("The 'onnxruntime' backend needs the onnxruntime package installed.")
+        if not os.path.exists(onnx_path):
+            raise FileNotFoundError(onnx_path)
+        return OnnxRuntimeNet(onnx_path, threads)
+
+    if threads is not None:
+        cv.setNumThreads(threads)
+    if backend == 'darknet':
+        if quantized:
+            raise ValueError("The quantized model is only available as an ONNX export.")
+        net = cv.dnn.readNetFromDarknet(f'{folder_path}/{model}.cfg', f'{folder_path}/{model}.weights')
+    elif backend == 'onnx':
+        if not os.path.exists(onnx_path):
+            raise FileNotFoundError(onnx_path)
+        net = cv.dnn.readNetFromONNX(onnx_path)
+    else:
+        raise ValueError(f"Unknown backend '{backend}', expected one of {', '.join(BACKENDS)}.")
+    net.setPreferableBackend(cv.dnn.DNN_BACKEND_OPENCV)
+    net.setPreferableTarget(cv.dnn.DNN_TARGET_CPU)
+    return net
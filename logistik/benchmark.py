@@ -0,0 +1,224 @@
+import argparse
+import json
+import os
+import time
+import tracemalloc
+import cv2 as cv
+import numpy as np
+from main import *
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Stored results the later runs are compared against
+BASELINE_PATH: str = 'benchmark-baseline.json'
+# Throughput drop, relative to the baseline, reported as a regression
+TOLERANCE: float = 0.1
+# Candidate rows of every output layer of YOLOv3 for a 416x416 input
+STUB_ROWS: list = [507, 2028, 8112]
+# Where the synthetic objects are drawn, as fractions (center x, center y, width, height) of the image
+OBJECT_BOX: tuple = (0.5, 0.5, 0.3, 0.6)
+STUB_CLASSES: list = [f'class{i}' for i in range(80)]
+STUB_CLASSES[39] = 'bottle'
+STUB_CLASSES[41] = 'cup'
+
+
+class StubNet:
+    """Stands in for cv.dnn.Net and answers every image with the same canned tensors.
+
+    The canned tensors hold low score noise plus a few overlapping candidates of a bottle placed on OBJECT_BOX,
+    so the post-processing and the color stages work exactly as they do with the real network.
+    """
+
+    def __init__(self, seed: int = 0, class_id: int = 39):
+        rng = np.random.default_rng(seed)
+        self.outputs = []
+        for rows in STUB_ROWS:
+            output = rng.random((rows, 85), dtype=np.float32)
+            output[:, 5:] *= 0.1
+            self.outputs.append(output)
+        x, y, w, h = OBJECT_BOX
+        for i, jitter in enumerate([0.0, 0.01, -0.01]):
+            self.outputs[1][i, :4] = [x + jitter, y - jitter, w, h]
+            self.outputs[1][i, 5 + class_id] = 0.9 - i * 0.05
+        self.batch = 1
+
+    def setInput(self, blob):
+        self.batch = blob.shape[0]
+
+    def forward(self, ln):
+        return [np.broadcast_to(output, (self.batch, *output.shape)) for output in self.outputs]
+
+    def getLayerNames(self):
+        return [f'yolo_{i}' for i in range(len(STUB_ROWS))]
+
+    def getUnconnectedOutLayers(self):
+        return np.arange(1, len(STUB_ROWS) + 1)
+
+
+def get_color_bgr(color: str):
+    lower = np.array(KNOWN_COLORS[color]['lower'])
+    upper = np.array(KNOWN_COLORS[color]['upper'])
+    hsv = ((lower + upper) // 2).astype(np.uint8).reshape(1, 1, 3)
+    return tuple(int(value) for value in cv.cvtColor(hsv, cv.COLOR_HSV2BGR)[0, 0])
+
+
+def generate_images(folder_path: str, amount: int, width: int, heigth: int, seed: int = 0):
+    """Writes synthetic conveyor images with an object of a known color on OBJECT_BOX.
+
+    Returns:
+        dict: The color drawn on every file.
+    """
+    os.makedirs(folder_path, exist_ok=True)
+    rng = np.random.default_rng(seed)
+    colors = list(KNOWN_COLORS.keys())
+    x, y, w, h = OBJECT_BOX
+    p0 = int((x - w / 2) * width), int((y - h / 2) * heigth)
+    p1 = int((x + w / 2) * width), int((y + h / 2) * heigth)
+    labels = {}
+    for i in range(amount):
+        img = rng.integers(120, 160, (heigth, width, 3), dtype=np.uint8)
+        color = colors[i % len(colors)]
+        cv.rectangle(img, p0, p1, get_color_bgr(color), -1)
+        filename = f'{folder_path}/synthetic{i:06d}.jpg'
+        cv.imwrite(filename, img)
+        labels[filename] = color
+    return labels
+
+
+def get_peak_memory_mb():
+    if resource is None:
+        return None
+    # ru_maxrss is reported in kilobytes on Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def summarize(name: str, latencies: list, elapsed: float, extra: dict = None):
+    latencies_ms = np.array(latencies) * 1000
+    result = {
+        'images': len(latencies),
+        'images_per_second': len(latencies) / elapsed if elapsed > 0 else 0.0,
+        'p50_ms': float(np.percentile(latencies_ms, 50)),
+        'p95_ms': float(np.percentile(latencies_ms, 95)),
+        'p99_ms': float(np.percentile(latencies_ms, 99)),
+    }
+    result.update(extra or {})
+    print(f"\n\t{name}: {result['images_per_second']:.1f} images/s, p50 {result['p50_ms']:.2f} ms, "
+          f"p95 {result['p95_ms']:.2f} ms, p99 {result['p99_ms']:.2f} ms")
+    return result
+
+
+def bench_pipeline(classes, net, ln, labels: dict, batch_size: int, legacy_color: bool):
+    latencies = []
+    hits = 0
+    tracemalloc.start()
+    start = time.perf_counter()
+    last = start
+    for batch in get_batches(stream_images(labels.keys()), batch_size):
+        objects_info = get_objects_info(classes, [img[1] for img in batch], ln, net, legacy_color)
+        hits += sum(1 for img, (object_name, color) in zip(batch, objects_info) if color == labels[img[0]])
+        now = time.perf_counter()
+        # Every image of a batch is charged the same share of the batch
+        latencies += [(now - last) / len(batch)] * len(batch)
+        last = now
+    elapsed = time.perf_counter() - start
+    traced_peak = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return summarize('pipeline', latencies, elapsed, {
+        'color_accuracy': hits / len(labels),
+        'traced_peak_mb': traced_peak / 2 ** 20
+    })
+
+
+def bench_postprocess(images: list, net, ln):
+    outputs = create_and_process_blob(net, ln, images[0])
+    latencies = []
+    start = time.perf_counter()
+    for img in images:
+        begin = time.perf_counter()
+        find_detections(img, outputs, 0.3)
+        latencies.append(time.perf_counter() - begin)
+    return summarize('postprocess', latencies, time.perf_counter() - start)
+
+
+def bench_color(images: list, labels: list):
+    heigth, width = get_height_and_width(images[0])
+    x, y, w, h = OBJECT_BOX
+    box = [int((x - w / 2) * width), int((y - h / 2) * heigth), int(w * width), int(h * heigth)]
+    latencies = []
+    hits = 0
+    start = time.perf_counter()
+    for img, label in zip(images, labels):
+        begin = time.perf_counter()
+        hits += classify_color(img, box) == label
+        latencies.append(time.perf_counter() - begin)
+    return summarize('color', latencies, time.perf_counter() - start, {'color_accuracy': hits / len(images)})
+
+
+def compare(results: dict, baseline: dict, tolerance: float = TOLERANCE):
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        previous = baseline[name]['images_per_second']
+        current = result['images_per_second']
+        change = (current - previous) / previous if previous > 0 else 0.0
+        print(f"\n\t{name}: {previous:.1f} -> {current:.1f} images/s ({change:+.1%})")
+        if change < -tolerance:
+            regressions.append(name)
+    return regressions
+
+
+def run(args):
+    labels = generate_images(args.folder, args.images, args.width, args.height, args.seed)
+    if args.network is not None:
+        classes, net, ln = initialize_network(args.network, backend=args.backend, quantized=args.quantized,
+                                              threads=args.threads)
+    else:
+        classes, net, ln = STUB_CLASSES, StubNet(args.seed), ['yolo_0', 'yolo_1', 'yolo_2']
+
+    results = {'pipeline': bench_pipeline(classes, net, ln, labels, args.batch_size, args.legacy_color)}
+    images = [img for filename, img in stream_images(list(labels.keys())[:args.stage_images])]
+    results['postprocess'] = bench_postprocess(images, net, ln)
+    results['color'] = bench_color(images, [labels[filename] for filename in list(labels.keys())[:len(images)]])
+    results['peak_memory_mb'] = get_peak_memory_mb()
+    return results
+
+
+def benchmark():
+    parser = argparse.ArgumentParser(description='Benchmark of the logistik pipeline over synthetic images.')
+    parser.add_argument('--images', type=int, default=200, help='amount of synthetic images')
+    parser.add_argument('--width', type=int, default=1280)
+    parser.add_argument('--height', type=int, default=960)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--folder', default='benchmark-images', help='where the synthetic images are written')
+    parser.add_argument('--network', default=None, help='Config folder of the real network, the stub is used if missing')
+    parser.add_argument('--backend', default=BACKEND, help='inference engine used with --network')
+    parser.add_argument('--quantized', action='store_true', help='use the int8 ONNX export with --network')
+    parser.add_argument('--threads', type=int, default=THREADS)
+    parser.add_argument('--batch-size', type=int, default=BATCH_SIZE)
+    parser.add_argument('--legacy-color', action='store_true')
+    parser.add_argument('--stage-images', type=int, default=100, help='images used by the isolated stages')
+    parser.add_argument('--baseline', default=BASELINE_PATH)
+    parser.add_argument('--save-baseline', action='store_true', help='store these results as the new baseline')
+    parser.add_argument('--tolerance', type=float, default=TOLERANCE)
+    args = parser.parse_args()
+
+    results = run(args)
+    if args.save_baseline:
+        with open(args.baseline, 'w') as file:
+            json.dump(results, file, indent=4)
+        print(f"\n\tBaseline saved to {args.baseline}")
+    elif os.path.exists(args.baseline):
+        with open(args.baseline) as file:
+            regressions = compare({name: result for name, result in results.items() if isinstance(result, dict)},
+                                  json.load(file), args.tolerance)
+        if len(regressions) > 0:
+            print(f"\n\tRegressions: {', '.join(regressions)}")
+            raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    benchmark()
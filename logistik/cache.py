@@ -0,0 +1,70 @@
+import hashlib
+import os
+import sqlite3
+import time
+
+# Files of the model that invalidate the cached detections when they change
+MODEL_FILES: list = ['coco.names', 'yolov3.cfg', 'yolov3.weights', 'yolov3-tiny.cfg', 'yolov3-tiny.weights',
+                     'yolov3.onnx', 'yolov3-int8.onnx', 'yolov3-tiny.onnx', 'yolov3-tiny-int8.onnx']
+# Maximum amount of images remembered, the least recently used ones are evicted first
+CACHE_MAX_ENTRIES: int = 100000
+# SQLite limits the amount of parameters of a single query
+QUERY_SIZE: int = 500
+
+
+def open_cache(path: str):
+    connection = sqlite3.connect(path)
+    connection.execute('CREATE TABLE IF NOT EXISTS detections '
+                       '(key TEXT PRIMARY KEY, object_name TEXT NOT NULL, color TEXT NOT NULL, used REAL NOT NULL)')
+    connection.execute('CREATE INDEX IF NOT EXISTS detections_used ON detections (used)')
+    return connection
+
+
+def hash_image(filename: str):
+    digest = hashlib.sha256()
+    with open(filename, 'rb') as file:
+        for block in iter(lambda: file.read(1 << 20), b''):
+            digest.update(block)
+    return digest.hexdigest()
+
+
+def get_fingerprint(config_path: str, *settings):
+    fingerprint = hashlib.sha256(repr(settings).encode())
+    for name in MODEL_FILES:
+        path = f'{config_path}/{name}'
+        if os.path.exists(path):
+            stat = os.stat(path)
+            fingerprint.update(f'{name}:{stat.st_size}:{stat.st_mtime_ns}'.encode())
+    return fingerprint.hexdigest()[:16]
+
+
+def make_key(image_digest: str, fingerprint: str):
+    return f'{fingerprint}:{image_digest}'
+
+
+def get_cached(connection, keys: list):
+    cached = {}
+    keys = list(keys)
+    for start in range(0, len(keys), QUERY_SIZE):
+        chunk = keys[start:start + QUERY_SIZE]
+        placeholders = ','.join('?' * len(chunk))
+        rows = connection.execute(f'SELECT key, object_name, color FROM detections WHERE key IN ({placeholders})',
+                                  chunk)
+        for key, object_name, color in rows:
+            cached[key] = (object_name, color)
+    # Hits count as a use for the eviction policy
+    used = time.time()
+    connection.executemany('UPDATE detections SET used = ? WHERE key = ?', [(used, key) for key in cached])
+    connection.commit()
+    return cached
+
+
+def put_cached(connection, detections: list, max_entries: int = CACHE_MAX_ENTRIES):
+    used = time.time()
+    connection.executemany('INSERT OR REPLACE INTO detections (key, object_name, color, used) VALUES (?, ?, ?, ?)',
+                           [(key, object_name, color, used) for key, object_name, color in detections])
+    excess = connection.execute('SELECT COUNT(*) FROM detections').fetchone()[0] - max_entries
+    if excess > 0:
+        connection.execute('DELETE FROM detections WHERE key IN '
+                           '(SELECT key FROM detections ORDER BY used LIMIT ?)', (excess,))
+    connection.commit()
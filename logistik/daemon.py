@@ -0,0 +1,112 @@
+import json
+import os
+import time
+from main import *
+
+# Seconds between two scans of the Config folder
+POLL_INTERVAL: float = 2.0
+# Append-only record of every processed image, the stock counters are rebuilt from it on start
+STATE_PATH: str = 'Archivos/procesados.log'
+STOCK_FOLDER: str = 'Archivos'
+
+
+def load_state(path: str = STATE_PATH):
+    processed: set = set()
+    bottles: dict = {}
+    cups: dict = {}
+    if os.path.exists(path):
+        with open(path, encoding='utf-8') as file:
+            for line in file:
+                try:
+                    filename, object_name, color = json.loads(line)
+                except ValueError:
+                    # The last line may be cut if the service stopped while writing it
+                    continue
+                processed.add(filename)
+                add_objects([filename], [(object_name, color)], bottles, cups)
+    return processed, bottles, cups
+
+
+def write_stock(name: str, stock: dict, folder_path: str = STOCK_FOLDER):
+    # The file is replaced at once so that readers never see it half written
+    temporary = f"{folder_path}/{name}.txt.tmp"
+    with open(temporary, "w") as archivo:
+        for key, value in stock.items():
+            archivo.write(f"{key} {str(value)}\n")
+    os.replace(temporary, f"{folder_path}/{name}.txt")
+
+
+def write_stocks(bottles: dict, cups: dict):
+    if len(bottles) > 0:
+        write_stock("botellas", bottles)
+    if len(cups) > 0:
+        write_stock("vasos", cups)
+
+
+def find_new_images(config_path: str, processed: set, sizes: dict):
+    """Returns the images not processed yet whose size did not change since the previous scan."""
+    ready = []
+    current: dict = {}
+    for entry in os.scandir(config_path):
+        if entry.is_dir():
+            for filename in list_images(entry.path.replace(os.sep, '/')):
+                if filename not in processed:
+                    try:
+                        current[filename] = os.path.getsize(filename)
+                    except OSError:
+                        continue
+                    if sizes.get(filename) == current[filename]:
+                        ready.append(filename)
+    sizes.clear()
+    sizes.update({filename: size for filename, size in current.items() if filename not in ready})
+    return sorted(ready)
+
+
+def process_images(network: tuple, filenames: list, state_file, processed: set, bottles: dict, cups: dict,
+                   batch_size: int = BATCH_SIZE, legacy_color: bool = LEGACY_COLOR):
+    classes, net, ln, light_network = network
+    for batch in get_batches(stream_images(filenames), batch_size):
+        objects_details = get_objects_details(classes, [img[1] for img in batch], ln, net, legacy_color,
+                                              light_network)
+        warn_hazards(add_objects([img[0] for img in batch], objects_details, bottles, cups))
+        for img, object_info in zip(batch, objects_details):
+            state_file.write(json.dumps([img[0], *object_info[:2]], ensure_ascii=False) + '\n')
+            processed.add(img[0])
+        state_file.flush()
+    # Images that could not be decoded are not retried on every scan
+    for filename in filenames:
+        if filename not in processed:
+            state_file.write(json.dumps([filename, 'Unknown', ''], ensure_ascii=False) + '\n')
+            processed.add(filename)
+    state_file.flush()
+
+
+def run_daemon(config_path: str = 'Config', poll_interval: float = POLL_INTERVAL, cascade: bool = CASCADE,
+               legacy_color: bool = LEGACY_COLOR):
+    """Keeps the network loaded and updates the stock files as new images arrive to any lote of Config."""
+    network = (*initialize_network(config_path), initialize_light_network(config_path, cascade))
+    processed, bottles, cups = load_state()
+    write_stocks(bottles, cups)
+    print(f"\n\t\tWatching '{config_path}', {len(processed)} images already processed.")
+    sizes: dict = {}
+    try:
+        with open(STATE_PATH, 'a', encoding='utf-8') as state_file:
+            while True:
+                filenames = find_new_images(config_path, processed, sizes)
+                if len(filenames) > 0:
+                    print(f"\n\t\tProcessing {len(filenames)} new images")
+                    process_images(network, filenames, state_file, processed, bottles, cups,
+                                   legacy_color=legacy_color)
+                    write_stocks(bottles, cups)
+                time.sleep(poll_interval)
+    except KeyboardInterrupt:
+        print("\n\t\tStopped.")
+    finally:
+        stop_alerts()
+
+
+if __name__ == '__main__':
+    try:
+        run_daemon()
+    except FileNotFoundError:
+        print("\n\t\tDirectory 'Config' not found.")
@@ -1,6 +1,17 @@
 import os
+import struct
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from functools import partial
+from itertools import islice
+from multiprocessing import Pool
 import cv2 as cv
 import numpy as np
+from cache import open_cache, hash_image, get_fingerprint, make_key, get_cached, put_cached
+from backends import read_network
+from alerts import start_alerts, send_alert, stop_alerts
+from metrics import reset_metrics, timed, count, get_snapshot, merge_metrics, write_report, print_progress
 
 # Constants
 KNOWN_COLORS: dict = {
@@ -25,13 +36,61 @@ KNOWN_COLORS: dict = {
         'upper': [180, 255, 50]
     }
 }
+# Side of the square images the network works with
+INPUT_SIZE: int = 416
+# Number of images pushed through the network on every forward pass
+BATCH_SIZE: int = 8
+# Decide colors with a YOLO pass per KNOWN_COLORS mask instead of the HSV statistics of the detected box
+LEGACY_COLOR: bool = False
+# Minimum share of the detected box a color has to cover to be reported
+MIN_COLOR_RATIO: float = 0.1
+# Maximum amount of pixels of the detected box sampled to decide its color
+MAX_COLOR_SAMPLES: int = 65536
+# Amount of images decoded ahead of the one being processed
+PREFETCH: int = 16
+# Threads used to decode the images of a lote
+DECODE_WORKERS: int = 4
+# Worker processes used to count the stock of a lote, 1 keeps the whole work in the current process
+WORKERS: int = 1
+# Amount of images handed to a worker process at a time
+CHUNK_SIZE: int = 64
+# Remember the detections of every image so that later runs skip the images already processed
+USE_CACHE: bool = True
+CACHE_NAME: str = 'detections.sqlite'
+# Ask a lightweight model first and only run the full one when it is not confident enough
+CASCADE: bool = False
+LIGHT_MODEL: str = 'yolov3-tiny'
+CASCADE_CONFIDENCE: float = 0.6
+# Let the JPEG decoder scale the images down as long as they stay bigger than the network input
+REDUCE_DECODE: bool = True
+# Region of the conveyor belt analyzed, as fractions (x, y, width, height) of the image, None to use all of it
+ROI: tuple = None
+# Machine readable report of the timings of a run, .json or .csv, None to skip it
+REPORT_PATH: str = 'metrics.json'
+# Print a periodic progress line instead of one line per processed image
+PROGRESS: bool = False
+# Inference engine, one of backends.BACKENDS, and whether to load the int8 quantized ONNX export
+BACKEND: str = 'darknet'
+QUANTIZED: bool = False
+# CPU threads used by the inference engine, None keeps its default
+THREADS: int = None
+COLOR_LOWER_BOUNDS = np.array([color['lower'] for color in KNOWN_COLORS.values()])
+COLOR_UPPER_BOUNDS = np.array([color['upper'] for color in KNOWN_COLORS.values()])
 
 
 def create_and_process_blob(net, ln, base_image):
-    blob = cv.dnn.blobFromImage(base_image, 1 / 255.0, (416, 416), swapRB=True, crop=False)
-    net.setInput(blob)
-    outputs = net.forward(ln)
-    return np.vstack(outputs)
+    return create_and_process_blobs(net, ln, [base_image])[0]
+
+
+def create_and_process_blobs(net, ln, base_images: list):
+    with timed('blob'):
+        blob = cv.dnn.blobFromImages(base_images, 1 / 255.0, (INPUT_SIZE, INPUT_SIZE), swapRB=True, crop=False)
+    with timed('forward'):
+        net.setInput(blob)
+        outputs = net.forward(ln)
+    # Each output layer holds the candidates of the whole batch, split them back per image
+    outputs = [output.reshape(len(base_images), -1, output.shape[-1]) for output in outputs]
+    return [np.vstack([output[i] for output in outputs]) for i in range(len(base_images))]
 
 
 def get_height_and_width(source):
@@ -39,48 +98,75 @@ def get_height_and_width(source):
 
 
 def analize_source(base_image, outputs, conf):
-    heigth, width = get_height_and_width(base_image)
-    boxes = []
-    confidences = []
-    class_ids = []
-    for output in outputs:
-        scores = output[5:]
-        class_id = np.argmax(scores)
-        confidence = scores[class_id]
-        if confidence > conf:
-            x, y, w, h = output[:4] * np.array([width, heigth, width, heigth])
-            p0 = int(x - w // 2), int(y - h // 2)
-            boxes.append([*p0, int(w), int(h)])
-            confidences.append(float(confidence))
-            class_ids.append(class_id)
-    indexes = cv.dnn.NMSBoxes(boxes, confidences, conf, conf - 0.1)
+    boxes, class_ids, confidences, indexes = find_detections(base_image, outputs, conf)
     return class_ids, confidences, indexes
 
 
-def recognize_object(base_image, classes, net, ln):
-    outputs = create_and_process_blob(net, ln, base_image)
-    class_ids, confidences, indexes = analize_source(base_image, outputs, 0.3)
+def find_detections(base_image, outputs, conf):
+    with timed('postprocess'):
+        heigth, width = get_height_and_width(base_image)
+        # Discard the candidates below the threshold before working on the survivors in bulk
+        scores = outputs[:, 5:]
+        candidates = outputs[scores.max(axis=1) > conf]
+        scores = candidates[:, 5:]
+        class_ids = scores.argmax(axis=1)
+        confidences = scores[np.arange(len(candidates)), class_ids]
+        x, y, w, h = (candidates[:, :4] * np.array([width, heigth, width, heigth])).T
+        boxes = np.stack([x - w // 2, y - h // 2, w, h], axis=1).astype(int)
+        boxes, class_ids, confidences = boxes.tolist(), class_ids.tolist(), confidences.astype(float).tolist()
+        indexes = cv.dnn.NMSBoxes(boxes, confidences, conf, conf - 0.1)
+    return boxes, class_ids, confidences, indexes
+
+
+def get_object_name(base_image, outputs, classes):
+    return get_object_detection(base_image, outputs, classes)[0]
+
+
+def get_object_detection(base_image, outputs, classes):
+    boxes, class_ids, confidences, indexes = find_detections(base_image, outputs, 0.3)
     if len(indexes) == 1:
-        return classes[class_ids[0]]
-    return 'Unknown'
+        index = np.array(indexes).flatten()[0]
+        return classes[class_ids[index]], boxes[index], confidences[index]
+    return 'Unknown', None, 0.0
+
+
+def recognize_object(base_image, classes, net, ln):
+    return recognize_objects([base_image], classes, net, ln)[0]
+
+
+def recognize_objects(base_images: list, classes, net, ln):
+    return [detection[0] for detection in detect_objects(base_images, classes, net, ln)]
+
+
+def detect_objects(base_images: list, classes, net, ln):
+    outputs = create_and_process_blobs(net, ln, base_images)
+    return [get_object_detection(img, output, classes) for img, output in zip(base_images, outputs)]
 
 
 def verify_color(filtered_image, net, ln):
     outputs = create_and_process_blob(net, ln, filtered_image)
+    return is_single_object(filtered_image, outputs)
+
+
+def is_single_object(filtered_image, outputs):
     class_ids, confidences, indexes = analize_source(filtered_image, outputs, 0.2)
     if len(indexes) == 1:
         return True
     return False
 
 
-def initialize_network(folder_path: dir):
+def load_classes(folder_path: str):
+    return open(f'{folder_path}/coco.names').read().strip().split('\n')
+
+
+def initialize_network(folder_path: dir, model: str = 'yolov3', backend: str = BACKEND, quantized: bool = QUANTIZED,
+                       threads: int = THREADS):
     # Load names of classes and get random colors
-    classes = open(f'{folder_path}/coco.names').read().strip().split('\n')
+    classes = load_classes(folder_path)
 
     # Give the configuration and weight files for the model and load the network.
-    net = cv.dnn.readNetFromDarknet(f'{folder_path}/yolov3.cfg', f'{folder_path}/yolov3.weights')
-    net.setPreferableBackend(cv.dnn.DNN_BACKEND_OPENCV)
-    net.setPreferableTarget(cv.dnn.DNN_TARGET_CPU)
+    with timed(f'initialize_network.{model}'):
+        net = read_network(folder_path, model, backend, quantized, threads)
 
     # determine the output layer
     ln = net.getLayerNames()
@@ -89,42 +175,213 @@ def initialize_network(folder_path: dir):
     return classes, net, ln
 
 
-def load_images(folder_path: str):
+def list_images(folder_path: str):
     if os.path.exists(folder_path):
-        filenames = [f'{folder_path}/{fn}' for fn in os.listdir(folder_path) if fn.endswith('.jpg')]
-    else:
-        raise FileNotFoundError
+        return [f'{folder_path}/{fn}' for fn in os.listdir(folder_path) if fn.endswith('.jpg')]
+    raise FileNotFoundError
 
-    images = []
-    for file in filenames:
-        img: np.ndarray = cv.imread(file)
-        if img is not None:
-            images.append((file, img))
-    return images
+
+def load_images(folder_path: str):
+    return list(stream_images(list_images(folder_path)))
+
+
+def get_jpeg_size(filename: str):
+    # A truncated or unreadable file has an unknown size, imread decides whether it can still be read
+    try:
+        with open(filename, 'rb') as file:
+            if file.read(2) != b'\xff\xd8':
+                return None
+            marker = file.read(2)
+            while len(marker) == 2 and marker[0] == 0xFF:
+                # Start of frame markers hold the size, the rest of the segments are skipped
+                if 0xC0 <= marker[1] <= 0xCF and marker[1] not in (0xC4, 0xC8, 0xCC):
+                    file.read(3)
+                    return struct.unpack('>HH', file.read(4))
+                length = struct.unpack('>H', file.read(2))[0]
+                if length < 2:
+                    return None
+                file.seek(length - 2, os.SEEK_CUR)
+                marker = file.read(2)
+    except (OSError, struct.error):
+        return None
+    return None
+
+
+def get_reduced_flag(heigth: int, width: int, roi: tuple = None):
+    if roi is not None:
+        heigth, width = heigth * roi[3], width * roi[2]
+    for factor, flag in [(8, cv.IMREAD_REDUCED_COLOR_8), (4, cv.IMREAD_REDUCED_COLOR_4),
+                         (2, cv.IMREAD_REDUCED_COLOR_2)]:
+        if min(heigth, width) / factor >= INPUT_SIZE:
+            return flag
+    return cv.IMREAD_COLOR
+
+
+def crop_roi(img, roi: tuple):
+    heigth, width = get_height_and_width(img)
+    x, y, w, h = roi
+    return img[int(y * heigth):int((y + h) * heigth), int(x * width):int((x + w) * width)]
+
+
+def read_image(filename: str, reduce_decode: bool = REDUCE_DECODE, roi: tuple = ROI):
+    flag = cv.IMREAD_COLOR
+    if reduce_decode:
+        size = get_jpeg_size(filename)
+        if size is not None:
+            flag = get_reduced_flag(*size, roi)
+    with timed('decode'):
+        img = cv.imread(filename, flag)
+        if img is not None and roi is not None:
+            img = np.ascontiguousarray(crop_roi(img, roi))
+    return img
+
+
+def stream_images(filenames, prefetch: int = PREFETCH, workers: int = DECODE_WORKERS,
+                  reduce_decode: bool = REDUCE_DECODE, roi: tuple = ROI):
+    filenames = iter(filenames)
+    read = partial(read_image, reduce_decode=reduce_decode, roi=roi)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        # At most 'prefetch' images are decoded and waiting to be consumed at any time
+        pending = deque((file, executor.submit(read, file)) for file in islice(filenames, prefetch))
+        while len(pending) > 0:
+            file, future = pending.popleft()
+            for next_file in islice(filenames, 1):
+                pending.append((next_file, executor.submit(read, next_file)))
+            img: np.ndarray = future.result()
+            if img is not None:
+                yield file, img
+
+
+def get_batches(iterable, batch_size: int):
+    iterator = iter(iterable)
+    batch = list(islice(iterator, batch_size))
+    while len(batch) > 0:
+        yield batch
+        batch = list(islice(iterator, batch_size))
 
 
 def identify_color(img, ln, net):
     color = None
     hsv = cv.cvtColor(img, cv.COLOR_BGR2HSV)
+    filtered_images = []
     for key in KNOWN_COLORS.keys():
+        count(f'color_check.{key}')
         lower = np.array(KNOWN_COLORS[key]['lower'])
         upper = np.array(KNOWN_COLORS[key]['upper'])
         mask = cv.inRange(hsv, lower, upper)
-        image = cv.bitwise_and(img, img, mask=mask)
-        if verify_color(image, net, ln):
+        filtered_images.append(cv.bitwise_and(img, img, mask=mask))
+    # All the color masks of the image go through the network in a single forward pass
+    outputs = create_and_process_blobs(net, ln, filtered_images)
+    for key, image, output in zip(KNOWN_COLORS.keys(), filtered_images, outputs):
+        if is_single_object(image, output):
             color = key
     return color
 
 
-def get_object_info(classes, img, ln, net):
-    color: str = ''
-    object_name = recognize_object(img, classes, net, ln)
-    if object_name not in ['bottle', 'cup']:
-        img = cv.GaussianBlur(img, (5, 5), cv.BORDER_DEFAULT)
-        object_name = recognize_object(img, classes, net, ln)
-    if object_name in ['bottle', 'cup']:
-        color = identify_color(img, ln, net)
-    return object_name, color
+def classify_color(img, box):
+    with timed('classify_color'):
+        return get_box_color(img, box)
+
+
+def get_box_color(img, box):
+    heigth, width = get_height_and_width(img)
+    x, y, w, h = box
+    roi = img[max(y, 0):min(y + h, heigth), max(x, 0):min(x + w, width)]
+    if roi.size == 0:
+        return ''
+    step = max(1, int(np.sqrt(roi.shape[0] * roi.shape[1] / MAX_COLOR_SAMPLES)))
+    hsv = cv.cvtColor(np.ascontiguousarray(roi[::step, ::step]), cv.COLOR_BGR2HSV).reshape(-1, 1, 3)
+    # Share of the sampled pixels that fall inside the range of every known color
+    inside = np.all((hsv >= COLOR_LOWER_BOUNDS) & (hsv <= COLOR_UPPER_BOUNDS), axis=2)
+    ratios = inside.mean(axis=0)
+    best = int(np.argmax(ratios))
+    if ratios[best] < MIN_COLOR_RATIO:
+        return ''
+    return list(KNOWN_COLORS.keys())[best]
+
+
+def get_object_info(classes, img, ln, net, legacy_color: bool = LEGACY_COLOR, light_network: tuple = None):
+    return get_objects_info(classes, [img], ln, net, legacy_color, light_network)[0]
+
+
+def get_objects_info(classes, images: list, ln, net, legacy_color: bool = LEGACY_COLOR, light_network: tuple = None,
+                     min_confidence: float = CASCADE_CONFIDENCE):
+    objects_details = get_objects_details(classes, images, ln, net, legacy_color, light_network, min_confidence)
+    return [(object_name, color) for object_name, color, box, confidence in objects_details]
+
+
+def get_objects_details(classes, images: list, ln, net, legacy_color: bool = LEGACY_COLOR,
+                        light_network: tuple = None, min_confidence: float = CASCADE_CONFIDENCE):
+    images = list(images)
+    if light_network is not None:
+        light_net, light_ln = light_network
+        detections = detect_objects(images, classes, light_net, light_ln)
+        # Only the images the light model is not sure about go through the full network
+        escalate = [i for i, detection in enumerate(detections) if detection[2] < min_confidence]
+        count('cascade_escalation', len(escalate))
+        if len(escalate) > 0:
+            for i, detection in zip(escalate, detect_objects([images[i] for i in escalate], classes, net, ln)):
+                detections[i] = detection
+    else:
+        detections = detect_objects(images, classes, net, ln)
+    retry = [i for i, detection in enumerate(detections) if detection[0] not in ['bottle', 'cup']]
+    count('blur_retry', len(retry))
+    if len(retry) > 0:
+        with timed('blur'):
+            blurred = [cv.GaussianBlur(images[i], (5, 5), cv.BORDER_DEFAULT) for i in retry]
+        for i, img, detection in zip(retry, blurred, detect_objects(blurred, classes, net, ln)):
+            images[i] = img
+            detections[i] = detection
+
+    objects_details = []
+    for img, (object_name, box, confidence) in zip(images, detections):
+        color: str = ''
+        if object_name in ['bottle', 'cup']:
+            if legacy_color:
+                color = identify_color(img, ln, net)
+            else:
+                color = classify_color(img, box)
+        objects_details.append((object_name, color, box, confidence))
+    return objects_details
+
+
+def get_iou(box_a, box_b):
+    xa, ya, wa, ha = box_a
+    xb, yb, wb, hb = box_b
+    w = min(xa + wa, xb + wb) - max(xa, xb)
+    h = min(ya + ha, yb + hb) - max(ya, yb)
+    if w <= 0 or h <= 0:
+        return 0.0
+    return w * h / float(wa * ha + wb * hb - w * h)
+
+
+def check_parity(folder_path: str, filenames: list, backend: str, quantized: bool = QUANTIZED,
+                 threads: int = THREADS, batch_size: int = BATCH_SIZE):
+    """Compares the detections of a backend against the Darknet model over the given images."""
+    classes, reference_net, reference_ln = initialize_network(folder_path, threads=threads)
+    classes, net, ln = initialize_network(folder_path, backend=backend, quantized=quantized, threads=threads)
+    matches = 0
+    ious = []
+    confidence_deltas = []
+    images = 0
+    for batch in get_batches(stream_images(filenames), batch_size):
+        batch_images = [img[1] for img in batch]
+        expected = detect_objects(batch_images, classes, reference_net, reference_ln)
+        for reference, detection in zip(expected, detect_objects(batch_images, classes, net, ln)):
+            images += 1
+            matches += reference[0] == detection[0]
+            if reference[1] is not None and detection[1] is not None:
+                ious.append(get_iou(reference[1], detection[1]))
+                confidence_deltas.append(abs(reference[2] - detection[2]))
+    parity = {
+        'images': images,
+        'same_object': matches / images if images > 0 else 0.0,
+        'mean_iou': float(np.mean(ious)) if len(ious) > 0 else 0.0,
+        'max_confidence_delta': max(confidence_deltas, default=0.0)
+    }
+    print(f"\n\t\t{backend}{' int8' if quantized else ''} vs darknet: {parity['same_object']:.1%} same object, "
+          f"mean IoU {parity['mean_iou']:.3f}, max confidence delta {parity['max_confidence_delta']:.3f}")
+    return parity
 
 
 def add_item(obj_dict, color):
@@ -135,30 +392,195 @@ def add_item(obj_dict, color):
             obj_dict[color] += 1
 
 
-def get_stock():
+def merge_items(obj_dict, other_dict):
+    for color, amount in other_dict.items():
+        obj_dict[color] = obj_dict.get(color, 0) + amount
+
+
+def add_objects(filenames: list, objects_info: list, bottles: dict, cups: dict):
+    """Counts the bottles and cups found and returns the hazards.
+
+    The items of objects_info are (object_name, color), optionally followed by the box and the confidence.
+    """
+    hazards = []
+    count('images', len(filenames))
+    for filename, object_info in zip(filenames, objects_info):
+        object_name, color = object_info[:2]
+        if object_name == 'bottle':
+            add_item(bottles, color)
+        elif object_name == 'cup':
+            add_item(cups, color)
+        elif object_name == 'cat':
+            hazard = {'filename': filename, 'object_name': object_name}
+            if len(object_info) == 4:
+                hazard['box'] = object_info[2]
+                hazard['confidence'] = object_info[3]
+            hazards.append(hazard)
+    return hazards
+
+
+def warn_hazards(hazards: list):
+    # The alerts are delivered by another thread, the lote keeps being processed
+    for hazard in hazards:
+        print(f"\n\t\tDANGER! There is a cat on the conveyor belt!!! ({hazard['filename']})")
+        send_alert({'time': time.time(), **hazard})
+
+
+# Network of the current worker process, loaded once by initialize_worker
+worker_network: tuple = ()
+
+
+def initialize_worker(config_path: str, cascade: bool, backend: str, quantized: bool):
+    global worker_network
+    # A forked worker inherits the counters of the parent, which already counts them
+    reset_metrics()
+    # The cores are already shared between the worker processes
+    cv.setNumThreads(1)
+    try:
+        worker_network = (*initialize_network(config_path, backend=backend, quantized=quantized, threads=1),
+                          initialize_light_network(config_path, cascade, backend, quantized, 1))
+    except Exception as error:
+        # A failing initializer makes the pool start new workers forever, the error is raised by count_chunk
+        worker_network = error
+
+
+def initialize_light_network(config_path: str, cascade: bool, backend: str = BACKEND, quantized: bool = QUANTIZED,
+                             threads: int = THREADS):
+    if not cascade:
+        return None
+    classes, net, ln = initialize_network(config_path, LIGHT_MODEL, backend, quantized, threads)
+    return net, ln
+
+
+def count_chunk(filenames: list, batch_size: int, legacy_color: bool, reduce_decode: bool, roi: tuple):
+    if isinstance(worker_network, Exception):
+        raise worker_network
+    classes, net, ln, light_network = worker_network
+    bottles: dict = {}
+    cups: dict = {}
+    hazards: list = []
+    detections: list = []
+    for batch in get_batches(stream_images(filenames, workers=1, reduce_decode=reduce_decode, roi=roi), batch_size):
+        objects_details = get_objects_details(classes, [img[1] for img in batch], ln, net, legacy_color,
+                                              light_network)
+        hazards += add_objects([img[0] for img in batch], objects_details, bottles, cups)
+        detections += zip([img[0] for img in batch], objects_details)
+    # The parent process merges the metrics of every chunk, they are not sent twice
+    snapshot = get_snapshot()
+    reset_metrics()
+    return bottles, cups, hazards, detections, snapshot
+
+
+def count_stock_parallel(config_path: str, filenames: list, bottles: dict, cups: dict, workers: int,
+                         chunk_size: int, batch_size: int, legacy_color: bool, cascade: bool, reduce_decode: bool,
+                         roi: tuple, cache=None, keys: dict = None, progress: bool = PROGRESS,
+                         backend: str = BACKEND, quantized: bool = QUANTIZED):
+    task = partial(count_chunk, batch_size=batch_size, legacy_color=legacy_color, reduce_decode=reduce_decode,
+                   roi=roi)
+    with Pool(workers, initializer=initialize_worker, initargs=(config_path, cascade, backend, quantized)) as pool:
+        for chunk_bottles, chunk_cups, hazards, detections, snapshot in pool.imap_unordered(
+                task, get_batches(filenames, chunk_size)):
+            merge_items(bottles, chunk_bottles)
+            merge_items(cups, chunk_cups)
+            merge_metrics(snapshot)
+            if progress:
+                print_progress()
+            if cache is not None:
+                remember_detections(cache, keys, [detection[0] for detection in detections],
+                                    [detection[1] for detection in detections])
+            warn_hazards(hazards)
+
+
+def get_cache_keys(config_path: str, filenames: list, settings: tuple, workers: int = DECODE_WORKERS):
+    fingerprint = get_fingerprint(config_path, MIN_COLOR_RATIO, *settings)
+    with ThreadPoolExecutor(max_workers=workers) as executor:
+        digests = executor.map(hash_image, filenames)
+        return {filename: make_key(digest, fingerprint) for filename, digest in zip(filenames, digests)}
+
+
+def count_cached(cache, keys: dict, bottles: dict, cups: dict):
+    cached = get_cached(cache, keys.values())
+    hits = [filename for filename in keys.keys() if keys[filename] in cached]
+    count('cache_hit', len(hits))
+    count('cache_miss', len(keys) - len(hits))
+    warn_hazards(add_objects(hits, [cached[keys[filename]] for filename in hits], bottles, cups))
+    return [filename for filename in keys.keys() if keys[filename] not in cached]
+
+
+def remember_detections(cache, keys: dict, filenames: list, objects_info: list):
+    put_cached(cache, [(keys[filename], *object_info[:2]) for filename, object_info in zip(filenames, objects_info)])
+
+
+def count_stock(batch_size: int, legacy_color: bool, prefetch: int, workers: int, chunk_size: int, use_cache: bool,
+                cascade: bool, reduce_decode: bool, roi: tuple, report_path: str, progress: bool, backend: str,
+                quantized: bool, threads: int):
     config_path = "Config"
     images_path = f"{config_path}/Lote0001"
     bottles: dict = {}
     cups: dict = {}
     try:
-        classes, net, ln = initialize_network(config_path)
+        if workers > 1:
+            # Every worker process loads its own network, here it is only checked that the configuration exists
+            load_classes(config_path)
+        else:
+            classes, net, ln = initialize_network(config_path, backend=backend, quantized=quantized, threads=threads)
+            light_network = initialize_light_network(config_path, cascade, backend, quantized, threads)
     except FileNotFoundError:
         print(f"\n\t\tDirectory '{config_path}' not found.")
     else:
         try:
-            images = load_images(images_path)
+            filenames = list_images(images_path)
         except FileNotFoundError:
             print(f"\n\t\tDirectory '{images_path}' not found.")
         else:
             print("\n\t\tLoading...\n")
-            for img in images:
-                print(f"\n\t\tProcessing {img[0]}")
-                object_name, color = get_object_info(classes, img[1], ln, net)
-                if object_name == 'bottle':
-                    add_item(bottles, color)
-                elif object_name == 'cup':
-                    add_item(cups, color)
-                elif object_name == 'cat':
-                    print("\n\t\tDANGER! There is a cat on the conveyor belt!!!")
-                    input("\n\tPress ENTER to continue...")
+            cache = None
+            keys: dict = {}
+            if use_cache:
+                cache = open_cache(f'{config_path}/{CACHE_NAME}')
+                keys = get_cache_keys(config_path, filenames,
+                                      (legacy_color, cascade and CASCADE_CONFIDENCE, reduce_decode, roi,
+                                       backend, quantized))
+                total = len(filenames)
+                filenames = count_cached(cache, keys, bottles, cups)
+                print(f"\n\t\t{total - len(filenames)} of {total} images found in the cache")
+            if workers > 1:
+                print(f"\n\t\tProcessing {len(filenames)} images with {workers} workers")
+                count_stock_parallel(config_path, filenames, bottles, cups, workers, chunk_size, batch_size,
+                                     legacy_color, cascade, reduce_decode, roi, cache, keys, progress, backend,
+                                     quantized)
+            else:
+                for batch in get_batches(stream_images(filenames, prefetch, reduce_decode=reduce_decode, roi=roi),
+                                         batch_size):
+                    if progress:
+                        print_progress()
+                    else:
+                        for img in batch:
+                            print(f"\n\t\tProcessing {img[0]}")
+                    objects_details = get_objects_details(classes, [img[1] for img in batch], ln, net, legacy_color,
+                                                          light_network)
+                    warn_hazards(add_objects([img[0] for img in batch], objects_details, bottles, cups))
+                    if cache is not None:
+                        remember_detections(cache, keys, [img[0] for img in batch], objects_details)
+            if cache is not None:
+                cache.close()
+            if progress:
+                print_progress(force=True)
+            if report_path is not None:
+                write_report(report_path)
     return bottles, cups
+
+
+def get_stock(batch_size: int = BATCH_SIZE, legacy_color: bool = LEGACY_COLOR, prefetch: int = PREFETCH,
+              workers: int = WORKERS, chunk_size: int = CHUNK_SIZE, use_cache: bool = USE_CACHE,
+              cascade: bool = CASCADE, reduce_decode: bool = REDUCE_DECODE, roi: tuple = ROI,
+              report_path: str = REPORT_PATH, progress: bool = PROGRESS, on_alert=None, backend: str = BACKEND,
+              quantized: bool = QUANTIZED, threads: int = THREADS):
+    reset_metrics()
+    start_alerts(callback=on_alert)
+    try:
+        return count_stock(batch_size, legacy_color, prefetch, workers, chunk_size, use_cache, cascade, reduce_decode,
+                           roi, report_path, progress, backend, quantized, threads)
+    finally:
+        # The alert thread and its queue must not outlive a failed run
+        stop_alerts()
@@ -0,0 +1,132 @@
+import csv
+import json
+import threading
+import time
+from contextlib import contextmanager
+
+# Upper bounds, in milliseconds, of the buckets of the latency histograms
+BUCKETS: list = [1, 2, 5, 10, 20, 50, 100, 200, 500, 1000, 2000, 5000, 10000, float('inf')]
+# Seconds between two progress lines
+PROGRESS_INTERVAL: float = 5.0
+
+metrics: dict = {}
+lock = threading.Lock()
+
+
+def reset_metrics():
+    with lock:
+        metrics.clear()
+        metrics.update({'stages': {}, 'counters': {}, 'started': time.perf_counter(), 'last_progress': 0.0})
+
+
+def record_latency(stage: str, seconds: float):
+    milliseconds = seconds * 1000
+    with lock:
+        if stage not in metrics['stages']:
+            metrics['stages'][stage] = {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0, 'buckets': [0] * len(BUCKETS)}
+        item = metrics['stages'][stage]
+        item['count'] += 1
+        item['total_ms'] += milliseconds
+        item['max_ms'] = max(item['max_ms'], milliseconds)
+        item['buckets'][next(i for i, bound in enumerate(BUCKETS) if milliseconds <= bound)] += 1
+
+
+@contextmanager
+def timed(stage: str):
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        record_latency(stage, time.perf_counter() - start)
+
+
+def count(counter: str, amount: int = 1):
+    with lock:
+        metrics['counters'][counter] = metrics['counters'].get(counter, 0) + amount
+
+
+def get_snapshot():
+    with lock:
+        return json.loads(json.dumps({'stages': metrics['stages'], 'counters': metrics['counters']}))
+
+
+def merge_metrics(snapshot: dict):
+    with lock:
+        for counter, amount in snapshot['counters'].items():
+            metrics['counters'][counter] = metrics['counters'].get(counter, 0) + amount
+        for stage, other in snapshot['stages'].items():
+            if stage not in metrics['stages']:
+                metrics['stages'][stage] = {'count': 0, 'total_ms': 0.0, 'max_ms': 0.0,
+                                            'buckets': [0] * len(BUCKETS)}
+            item = metrics['stages'][stage]
+            item['count'] += other['count']
+            item['total_ms'] += other['total_ms']
+            item['max_ms'] = max(item['max_ms'], other['max_ms'])
+            item['buckets'] = [a + b for a, b in zip(item['buckets'], other['buckets'])]
+
+
+def get_percentile(buckets: list, percentile: float):
+    # The histogram only knows the bucket of every sample, its upper bound is reported
+    target = sum(buckets) * percentile / 100
+    accumulated = 0
+    for bound, amount in zip(BUCKETS, buckets):
+        accumulated += amount
+        if amount > 0 and accumulated >= target:
+            return bound
+    return 0
+
+
+def get_report():
+    elapsed = time.perf_counter() - metrics['started']
+    images = metrics['counters'].get('images', 0)
+    report = {
+        'elapsed_s': elapsed,
+        'images': images,
+        'images_per_second': images / elapsed if elapsed > 0 else 0.0,
+        'counters': dict(metrics['counters']),
+        'stages': {}
+    }
+    for stage, item in metrics['stages'].items():
+        report['stages'][stage] = {
+            'count': item['count'],
+            'total_ms': item['total_ms'],
+            'mean_ms': item['total_ms'] / item['count'],
+            'p50_ms': min(get_percentile(item['buckets'], 50), item['max_ms']),
+            'p95_ms': min(get_percentile(item['buckets'], 95), item['max_ms']),
+            'p99_ms': min(get_percentile(item['buckets'], 99), item['max_ms']),
+            'max_ms': item['max_ms'],
+            'histogram': {str(bound): amount for bound, amount in zip(BUCKETS, item['buckets'])}
+        }
+    return report
+
+
+def write_report(path: str):
+    report = get_report()
+    if path.endswith('.csv'):
+        with open(path, 'w', newline='') as file:
+            writer = csv.writer(file)
+            writer.writerow(['stage', 'count', 'total_ms', 'mean_ms', 'p50_ms', 'p95_ms', 'p99_ms', 'max_ms'])
+            for stage, item in report['stages'].items():
+                writer.writerow([stage, item['count'], item['total_ms'], item['mean_ms'], item['p50_ms'],
+                                 item['p95_ms'], item['p99_ms'], item['max_ms']])
+            for counter, amount in report['counters'].items():
+                writer.writerow([counter, amount])
+            writer.writerow(['images_per_second', report['images_per_second']])
+    else:
+        with open(path, 'w') as file:
+            json.dump(report, file, indent=4)
+    return report
+
+
+def print_progress(total: int = None, force: bool = False):
+    now = time.perf_counter()
+    if not force and now - metrics['last_progress'] < PROGRESS_INTERVAL:
+        return
+    metrics['last_progress'] = now
+    elapsed = now - metrics['started']
+    images = metrics['counters'].get('images', 0)
+    done = f"{images}/{total}" if total is not None else f"{images}"
+    print(f"\n\t\t{done} images, {images / elapsed if elapsed > 0 else 0.0:.1f} images/s")
+
+
+reset_metrics()
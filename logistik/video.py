@@ -0,0 +1,131 @@
+import sys
+import cv2 as cv
+import numpy as np
+from main import *
+
+# Size of the grayscale thumbnails compared to detect movement on the belt
+MOTION_SIZE: tuple = (64, 48)
+# Mean absolute difference (0-255) between two thumbnails above which something changed on the belt
+MOTION_THRESHOLD: float = 4.0
+# Maximum distance between the centers of two boxes, relative to the size of the box, to consider them
+# the same object moving along the belt
+TRACK_DISTANCE: float = 1.0
+# Analyzed frames an object can go unseen before it is considered gone
+TRACK_MAX_MISSED: int = 5
+
+
+def open_stream(source):
+    # A number selects a capture device, anything else is read as a video file
+    capture = cv.VideoCapture(int(source) if str(source).isdigit() else source)
+    if not capture.isOpened():
+        raise FileNotFoundError
+    return capture
+
+
+def stream_frames(capture):
+    index = 0
+    read, frame = capture.read()
+    while read:
+        yield index, frame
+        index += 1
+        read, frame = capture.read()
+
+
+def get_thumbnail(frame):
+    gray = cv.cvtColor(frame, cv.COLOR_BGR2GRAY)
+    return cv.GaussianBlur(cv.resize(gray, MOTION_SIZE, interpolation=cv.INTER_AREA), (3, 3), cv.BORDER_DEFAULT)
+
+
+def has_changed(thumbnail, reference, threshold: float = MOTION_THRESHOLD):
+    return reference is None or float(np.mean(cv.absdiff(thumbnail, reference))) > threshold
+
+
+def get_distance(box_a, box_b):
+    xa, ya, wa, ha = box_a
+    xb, yb, wb, hb = box_b
+    distance = np.hypot(xa + wa / 2 - xb - wb / 2, ya + ha / 2 - yb - hb / 2)
+    return distance / max(wa, ha, 1)
+
+
+def age_tracks(tracks: list, max_missed: int = TRACK_MAX_MISSED):
+    for track in tracks:
+        track['missed'] += 1
+    tracks[:] = [track for track in tracks if track['missed'] <= max_missed]
+
+
+def update_tracks(tracks: list, object_name: str, box, max_distance: float = TRACK_DISTANCE,
+                  max_missed: int = TRACK_MAX_MISSED):
+    """Returns True when the detection does not belong to any of the objects already on the belt."""
+    best_track = None
+    best_distance = max_distance
+    for track in tracks:
+        distance = get_distance(track['box'], box)
+        if track['object_name'] == object_name and distance <= best_distance:
+            best_track, best_distance = track, distance
+    for track in tracks:
+        if track is not best_track:
+            track['missed'] += 1
+    tracks[:] = [track for track in tracks if track['missed'] <= max_missed]
+    if best_track is None:
+        tracks.append({'object_name': object_name, 'box': box, 'missed': 0})
+        return True
+    best_track['box'] = box
+    return False
+
+
+def count_stream(source, config_path: str = 'Config', legacy_color: bool = LEGACY_COLOR, cascade: bool = CASCADE,
+                 background=None, roi: tuple = ROI):
+    """Counts the bottles and cups passing through a video file or capture device.
+
+    The first frame, or the 'background' image when given, is taken as the empty belt. Frames that look like
+    the empty belt or that did not change since the last analyzed frame skip the network entirely.
+    """
+    bottles: dict = {}
+    cups: dict = {}
+    classes, net, ln = initialize_network(config_path)
+    light_network = initialize_light_network(config_path, cascade)
+    capture = open_stream(source)
+    if background is not None and roi is not None:
+        background = np.ascontiguousarray(crop_roi(background, roi))
+    empty_belt = None if background is None else get_thumbnail(background)
+    last_analyzed = None
+    tracks: list = []
+    analyzed = 0
+    try:
+        for index, frame in stream_frames(capture):
+            if roi is not None:
+                frame = np.ascontiguousarray(crop_roi(frame, roi))
+            thumbnail = get_thumbnail(frame)
+            if empty_belt is None:
+                empty_belt = thumbnail
+            if not has_changed(thumbnail, empty_belt):
+                # Nothing on the belt, whatever was being tracked already left
+                tracks.clear()
+                last_analyzed = None
+                continue
+            if not has_changed(thumbnail, last_analyzed):
+                continue
+            last_analyzed = thumbnail
+            analyzed += 1
+            object_name, color, box, confidence = get_objects_details(classes, [frame], ln, net, legacy_color,
+                                                                      light_network)[0]
+            if box is None:
+                age_tracks(tracks)
+            elif update_tracks(tracks, object_name, box):
+                warn_hazards(add_objects([f'{source}#{index}'], [(object_name, color, box, confidence)], bottles,
+                                         cups))
+    finally:
+        capture.release()
+        stop_alerts()
+    print(f"\n\t\t{analyzed} frames analyzed")
+    return bottles, cups
+
+
+if __name__ == '__main__':
+    try:
+        botellas, vasos = count_stream(sys.argv[1] if len(sys.argv) > 1 else 0)
+    except FileNotFoundError:
+        print("\n\t\tVideo source or 'Config' directory not found.")
+    else:
+        print(f"\n\tBotellas: {botellas}")
+        print(f"\tVasos: {vasos}")
@@ -0,0 +1,122 @@
+import math
+from datetime import datetime
+from indices import normalizar, FORMATO_FECHA
+
+# Agrupaciones que se mantienen de los pedidos enviados
+GRUPOS: tuple = ("ciudad", "provincia", "mes")
+# Diferencia aceptada entre un total acumulado y el recalculado, por el redondeo de las sumas y restas
+TOLERANCIA: float = 1e-6
+
+
+class Agregados:
+    """Totales de los pedidos enviados por ciudad, provincia y mes, separados por código de artículo.
+
+    Es un observador del almacén: cada alta o baja de un pedido enviado suma o resta sus líneas, así los
+    totales quedan al día sin recorrer los pedidos. Un cambio de estado de envío se recibe como la baja del
+    pedido sin enviar y el alta del pedido enviado.
+    """
+
+    def __init__(self, obtener_precio):
+        self.obtener_precio = obtener_precio
+        self.totales: dict = {grupo: {} for grupo in GRUPOS}
+        self.meses: dict = {}
+
+    def cargar(self, totales: dict) -> None:
+        """Parte de totales ya calculados, por ejemplo los guardados junto con los pedidos en el formato binario."""
+        for grupo in GRUPOS:
+            self.totales[grupo] = totales.get(grupo, {})
+
+    def obtener_mes(self, fecha: str):
+        if fecha not in self.meses:
+            try:
+                self.meses[fecha] = datetime.strptime(fecha, FORMATO_FECHA).strftime("%Y-%m")
+            except ValueError:
+                self.meses[fecha] = None
+        return self.meses[fecha]
+
+    def obtener_claves(self, pedido) -> list:
+        claves: list = [("ciudad", normalizar(pedido["ciudad"])), ("provincia", normalizar(pedido["provincia"]))]
+        mes = self.obtener_mes(pedido["fecha"])
+        if mes is not None:
+            claves.append(("mes", mes))
+        return claves
+
+    def sumar(self, pedido, signo: int) -> None:
+        if not pedido["enviado"]:
+            return
+        descuento: float = pedido["descuento"]
+        claves: list = self.obtener_claves(pedido)
+        for codigo, _, cantidad in pedido.recorrer_lineas():
+            bruto: float = float(self.obtener_precio(codigo) * cantidad)
+            neto: float = bruto * (100 - descuento) / 100
+            for grupo, valor in claves:
+                articulos: dict = self.totales[grupo].setdefault(valor, {})
+                item: dict = articulos.setdefault(codigo, {"cantidad": 0, "bruto": 0.0, "neto": 0.0})
+                item["cantidad"] += signo * cantidad
+                item["bruto"] += signo * bruto
+                item["neto"] += signo * neto
+                if item["cantidad"] == 0:
+                    # Sin pedidos no queda nada que sumar, se descarta también el error de redondeo acumulado
+                    del articulos[codigo]
+                    if len(articulos) == 0:
+                        del self.totales[grupo][valor]
+
+    def alta(self, nro_pedido: str, pedido) -> None:
+        self.sumar(pedido, 1)
+
+    def baja(self, nro_pedido: str, pedido) -> None:
+        self.sumar(pedido, -1)
+
+    def obtener(self, grupo: str, valor: str) -> dict:
+        """Devuelve los totales de un grupo.
+
+        Args:
+            grupo (str): ciudad, provincia o mes.
+            valor (str): Ciudad o provincia, sin importar mayúsculas, o mes con formato yyyy-mm.
+
+        Returns:
+            dict: {código: {"cantidad": n, "bruto": x, "neto": y}}
+        """
+        if grupo != "mes":
+            valor = normalizar(valor)
+        return self.totales[grupo].get(valor, {})
+
+
+def recalcular(pedidos, obtener_precio) -> Agregados:
+    """Calcula los totales desde cero recorriendo todos los pedidos."""
+    agregados: Agregados = Agregados(obtener_precio)
+    for nro_pedido, pedido in pedidos.items():
+        agregados.alta(nro_pedido, pedido)
+    return agregados
+
+
+def comparar(agregados: Agregados, esperados: Agregados) -> list[str]:
+    """Compara dos juegos de totales.
+
+    Returns:
+        list[str]: Una descripción de cada diferencia encontrada.
+    """
+    diferencias: list[str] = []
+    for grupo in GRUPOS:
+        valores: set = set(agregados.totales[grupo]) | set(esperados.totales[grupo])
+        for valor in sorted(valores):
+            actuales: dict = agregados.totales[grupo].get(valor, {})
+            calculados: dict = esperados.totales[grupo].get(valor, {})
+            for codigo in sorted(set(actuales) | set(calculados)):
+                vacio: dict = {"cantidad": 0, "bruto": 0.0, "neto": 0.0}
+                actual: dict = actuales.get(codigo, vacio)
+                calculado: dict = calculados.get(codigo, vacio)
+                for campo in vacio.keys():
+                    if not math.isclose(actual[campo], calculado[campo], rel_tol=TOLERANCIA, abs_tol=TOLERANCIA):
+                        diferencias.append(f"{grupo} {valor} cod-{codigo} {campo}: "
+                                           f"{actual[campo]} acumulado, {calculado[campo]} recalculado")
+    return diferencias
+
+
+if __name__ == '__main__':
+    import sys
+    from main import abrir_pedidos, verificar_agregados, CARPETA_DATOS
+
+    pedidos, diario = abrir_pedidos(sys.argv[1] if len(sys.argv) > 1 else CARPETA_DATOS)
+    diario.cerrar()
+    verificar_agregados(pedidos)
@@ -0,0 +1,312 @@
+import sys
+from array import array
+from collections.abc import MutableMapping
+from weakref import WeakValueDictionary
+from indices import Indices
+
+# Campos de texto que se repiten entre pedidos y se guardan una sola vez en memoria
+CAMPOS_INTERNADOS: tuple = ("fecha", "cliente", "ciudad", "provincia")
+CAMPOS: tuple = ("fecha", "cliente", "ciudad", "provincia", "productos", "descuento", "enviado")
+# Cada línea de un pedido ocupa tres posiciones seguidas del arreglo: código, color y cantidad
+ANCHO_LINEA: int = 3
+
+# Tablas compartidas de códigos de artículo y colores. Las líneas guardan la posición en estas tablas.
+codigos: list[str] = []
+ids_codigos: dict = {}
+colores: list[str] = []
+ids_colores: dict = {}
+
+
+def obtener_id(tabla: list[str], ids: dict, valor: str) -> int:
+    """Devuelve la posición de un valor en una tabla compartida, agregándolo si todavía no existe.
+
+    Args:
+        tabla (list[str]): Valores conocidos.
+        ids (dict): Posición de cada valor en la tabla.
+        valor (str): Valor buscado.
+
+    Returns:
+        int: La posición del valor en la tabla.
+    """
+    id_valor = ids.get(valor)
+    if id_valor is None:
+        id_valor = len(tabla)
+        tabla.append(sys.intern(valor))
+        ids[valor] = id_valor
+    return id_valor
+
+
+def poner_linea(lineas: array, codigo: str, color: str, cantidad: int) -> None:
+    """Fija la cantidad de un artículo y color en un arreglo de líneas, reemplazándola si la línea ya existe.
+
+    Raises:
+        OverflowError: Si la cantidad no entra en el arreglo.
+    """
+    id_codigo = obtener_id(codigos, ids_codigos, codigo)
+    id_color = obtener_id(colores, ids_colores, color)
+    for i in range(0, len(lineas), ANCHO_LINEA):
+        if lineas[i] == id_codigo and lineas[i + 1] == id_color:
+            lineas[i + 2] = cantidad
+            return
+    lineas.extend((id_codigo, id_color, cantidad))
+
+
+def armar_lineas(productos: dict) -> array:
+    """Arma las líneas de un pedido a partir de los productos con la estructura {código: {color: {"cantidad": n}}}."""
+    lineas: array = array('I')
+    for codigo, items in productos.items():
+        for color, item in items.items():
+            poner_linea(lineas, codigo, color, item["cantidad"])
+    return lineas
+
+
+class Pedido:
+    """Registro compacto de un pedido.
+
+    Se accede a los campos igual que a un diccionario: pedido["ciudad"]. El campo "productos" se arma
+    al momento como {código: {color: {"cantidad": n}}}; al modificarlo hay que volver a asignarlo.
+    Mientras está guardado en un almacén, cada cambio se le avisa a los observadores del almacén.
+    """
+
+    __slots__ = ("fecha", "cliente", "ciudad", "provincia", "lineas", "descuento", "enviado", "nro", "almacen",
+                 "__weakref__")
+
+    def __init__(self, fecha: str, cliente: str, ciudad: str, provincia: str, productos: dict, descuento: float,
+                 enviado: bool = False):
+        self.fecha: str = sys.intern(fecha)
+        self.cliente: str = sys.intern(cliente)
+        self.ciudad: str = sys.intern(ciudad)
+        self.provincia: str = sys.intern(provincia)
+        self.lineas: array = array('I')
+        self.descuento: float = descuento
+        self.enviado: bool = enviado
+        self.nro: str = None
+        self.almacen: Pedidos = None
+        self.asignar_productos(productos)
+
+    def __getitem__(self, campo: str):
+        if campo == "productos":
+            return self.obtener_productos()
+        if campo not in CAMPOS:
+            raise KeyError(campo)
+        return getattr(self, campo)
+
+    def __setitem__(self, campo: str, valor) -> None:
+        if campo not in CAMPOS:
+            raise KeyError(campo)
+        # El valor nuevo se arma antes de avisar la baja, así un valor inválido no deja el pedido dado de baja
+        if campo == "productos":
+            campo, valor = "lineas", armar_lineas(valor)
+        elif campo in CAMPOS_INTERNADOS:
+            valor = sys.intern(valor)
+        self.avisar("baja")
+        setattr(self, campo, valor)
+        self.avisar("alta")
+
+    def __contains__(self, campo: str) -> bool:
+        return campo in CAMPOS
+
+    def keys(self) -> tuple:
+        return CAMPOS
+
+    def avisar(self, evento: str) -> None:
+        # Los avisos de un pedido siempre son la baja y el alta de una modificación
+        if self.almacen is not None:
+            self.almacen.avisar(evento, self.nro, self, modificacion=True)
+
+    def recorrer_lineas(self):
+        """Recorre las líneas del pedido sin armar diccionarios.
+
+        Returns:
+            Generador de tuplas (código, color, cantidad).
+        """
+        lineas = self.lineas
+        for i in range(0, len(lineas), ANCHO_LINEA):
+            yield codigos[lineas[i]], colores[lineas[i + 1]], lineas[i + 2]
+
+    def poner_cantidad(self, codigo: str, color: str, cantidad: int) -> None:
+        """Fija la cantidad de un artículo y color. Si la línea ya existe, la reemplaza en el mismo lugar.
+
+        Args:
+            codigo (str): Código del artículo.
+            color (str): Color del artículo.
+            cantidad (int): Cantidad pedida.
+        """
+        lineas: array = array('I', self.lineas)
+        poner_linea(lineas, codigo, color, cantidad)
+        self.avisar("baja")
+        self.lineas = lineas
+        self.avisar("alta")
+
+    def agregar_linea(self, codigo: str, color: str, cantidad: int) -> None:
+        poner_linea(self.lineas, codigo, color, cantidad)
+
+    def obtener_productos(self) -> dict:
+        productos: dict = {}
+        for codigo, color, cantidad in self.recorrer_lineas():
+            productos.setdefault(codigo, {})[color] = {"cantidad": cantidad}
+        return productos
+
+    def asignar_productos(self, productos: dict) -> None:
+        self.lineas = armar_lineas(productos)
+
+    def a_dict(self) -> dict:
+        """Devuelve el pedido con la misma estructura de diccionario que usa el menú."""
+        return {campo: self[campo] for campo in CAMPOS}
+
+
+class Pedidos(MutableMapping):
+    """Conjunto de pedidos indexado por número de pedido.
+
+    Acepta tanto registros Pedido como diccionarios con la estructura original, que se convierten al guardarlos.
+    Los observadores reciben alta(nro, pedido) y baja(nro, pedido) por cada pedido agregado, modificado o eliminado;
+    una modificación se avisa como la baja del pedido anterior y el alta del pedido nuevo.
+
+    Puede partir de una base, un archivo binario abierto con PedidosBinarios: sus pedidos se decodifican recién al
+    accederlos y solo los pedidos nuevos o modificados se guardan en memoria, ocultando su versión de la base.
+    """
+
+    def __init__(self, pedidos: dict = None, base=None):
+        # Pedidos nuevos o modificados respecto de la base
+        self.registros: dict = {}
+        self.base = base
+        # Números de pedido de la base que se modificaron o eliminaron
+        self.ocultos: set = set()
+        # Pedidos de la base ya entregados, para devolver siempre el mismo registro mientras alguien lo use
+        self.decodificados: WeakValueDictionary = WeakValueDictionary()
+        # Números de pedido cambiados desde congelar(), None si no se está guardando una copia
+        self.cambiados: set = None
+        self.indices: Indices = Indices(base, self.ocultos)
+        self.observadores: list = [self.indices]
+        # Número del pedido cuya baja se está avisando como parte de una modificación, seguida de su alta
+        self.modificando: str = None
+        # Totales de los pedidos enviados. Los registra quien conoce los precios, ver agregar_observador().
+        self.agregados = None
+        if pedidos is not None:
+            self.update(pedidos)
+
+    def __getitem__(self, nro_pedido: str) -> Pedido:
+        pedido: Pedido = self.registros.get(nro_pedido)
+        if pedido is not None:
+            return pedido
+        if self.base is None or nro_pedido in self.ocultos:
+            raise KeyError(nro_pedido)
+        pedido = self.decodificados.get(nro_pedido)
+        if pedido is None:
+            pedido = self.base[nro_pedido]
+            pedido.nro = sys.intern(nro_pedido)
+            pedido.almacen = self
+            self.decodificados[nro_pedido] = pedido
+        return pedido
+
+    def __contains__(self, nro_pedido) -> bool:
+        if nro_pedido in self.registros:
+            return True
+        return self.base is not None and nro_pedido not in self.ocultos and nro_pedido in self.base
+
+    def __setitem__(self, nro_pedido: str, pedido) -> None:
+        if not isinstance(pedido, Pedido):
+            pedido = Pedido(**pedido)
+        elif pedido.almacen is not None and pedido.almacen is not self:
+            raise ValueError(f"El pedido {pedido.nro} ya pertenece a otro almacén.")
+        nro_pedido = sys.intern(nro_pedido)
+        anterior: Pedido = self.get(nro_pedido)
+        if anterior is not None:
+            self.avisar("baja", nro_pedido, anterior, modificacion=True)
+            anterior.almacen = None
+            self.ocultar(nro_pedido)
+        pedido.nro = nro_pedido
+        pedido.almacen = self
+        self.registros[nro_pedido] = pedido
+        self.avisar("alta", nro_pedido, pedido)
+
+    def __delitem__(self, nro_pedido: str) -> None:
+        pedido: Pedido = self[nro_pedido]
+        self.ocultar(nro_pedido)
+        self.registros.pop(nro_pedido, None)
+        self.avisar("baja", nro_pedido, pedido)
+        pedido.almacen = None
+
+    def __iter__(self):
+        if self.base is not None:
+            for nro_pedido in self.base:
+                if nro_pedido not in self.ocultos:
+                    yield nro_pedido
+        yield from self.registros
+
+    def __len__(self) -> int:
+        if self.base is None:
+            return len(self.registros)
+        return len(self.base) - len(self.ocultos) + len(self.registros)
+
+    def ocultar(self, nro_pedido: str) -> None:
+        """Oculta la versión de la base de un pedido que se modifica o elimina."""
+        if nro_pedido not in self.registros and self.base is not None:
+            self.ocultos.add(nro_pedido)
+            self.decodificados.pop(nro_pedido, None)
+
+    def avisar(self, evento: str, nro_pedido: str, pedido: Pedido, modificacion: bool = False) -> None:
+        self.modificando = nro_pedido if modificacion and evento == "baja" else None
+        if self.cambiados is not None:
+            self.cambiados.add(nro_pedido)
+        if evento == "alta" and nro_pedido not in self.registros:
+            # Un pedido de la base que se modificó en su lugar pasa a guardarse en memoria
+            self.ocultar(nro_pedido)
+            self.registros[nro_pedido] = pedido
+        for observador in self.observadores:
+            getattr(observador, evento)(nro_pedido, pedido)
+
+    def agregar_observador(self, observador, informar_cargados: bool = True) -> None:
+        """Registra un observador y, salvo que se indique lo contrario, le da de alta los pedidos ya cargados."""
+        self.observadores.append(observador)
+        if informar_cargados:
+            for nro_pedido, pedido in self.items():
+                observador.alta(nro_pedido, pedido)
+
+    def congelar(self):
+        """Toma los pedidos tal como están para guardarlos, por ejemplo desde otro hilo, y empieza a anotar los
+        números de pedido que cambien hasta cambiar_base().
+
+        Returns:
+            Generador de pares (número de pedido, pedido). Un pedido modificado en su lugar mientras se recorre
+            puede aparecer con el cambio; el diario lo vuelve a escribir completo, así que al reproducirlo se corrige.
+        """
+        base, ocultos, registros = self.base, set(self.ocultos), dict(self.registros)
+        self.cambiados = set()
+
+        def recorrer():
+            if base is not None:
+                for nro_pedido, pedido in base.items():
+                    if nro_pedido not in ocultos:
+                        yield nro_pedido, pedido
+            yield from registros.items()
+
+        return recorrer()
+
+    def cambiar_base(self, base) -> None:
+        """Pasa a leer de una base nueva, escrita a partir de congelar(). Solo quedan en memoria los pedidos que
+        cambiaron desde entonces.
+
+        Args:
+            base (PedidosBinarios): Archivo binario con los pedidos congelados.
+        """
+        cambiados: set = self.cambiados or set()
+        self.cambiados = None
+        registros: dict = {}
+        for nro_pedido, pedido in self.registros.items():
+            if nro_pedido in cambiados:
+                registros[nro_pedido] = pedido
+            else:
+                # El registro sigue siendo válido para quien lo tenga, ahora equivale a su versión de la base
+                self.decodificados[nro_pedido] = pedido
+        self.base = base
+        self.registros = registros
+        self.ocultos.clear()
+        self.ocultos.update(nro_pedido for nro_pedido in cambiados if nro_pedido in base)
+        for nro_pedido in cambiados:
+            self.decodificados.pop(nro_pedido, None)
+        self.indices.cambiar_base(base, registros)
+
+    def a_dict(self) -> dict:
+        """Devuelve todos los pedidos con la estructura de diccionarios anidados, por ejemplo para listarlos."""
+        return {nro_pedido: pedido.a_dict() for nro_pedido, pedido in self.items()}
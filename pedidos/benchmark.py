@@ -0,0 +1,203 @@
+import argparse
+import contextlib
+import json
+import os
+import random
+import tempfile
+import time
+import tracemalloc
+from diario import Diario
+from exportar import exportar, obtener_pagina
+from generador import CIUDADES, generar_csv
+from lotes import aplicar_lote
+from main import cargar_pedidos, obtener_valor_total_por_ciudad
+
+try:
+    import resource
+except ImportError:
+    resource = None
+
+# Resultados guardados contra los que se comparan las corridas siguientes
+RUTA_REFERENCIA: str = 'benchmark-pedidos.json'
+# Caída de velocidad, relativa a la guardada, que se informa como una regresión
+TOLERANCIA: float = 0.1
+# Líneas de los archivos generados en cada corrida
+TAMANIOS: list[int] = [10000, 100000]
+CONSULTAS: int = 200
+PAGINAS: int = 200
+
+
+def obtener_memoria_pico_mb():
+    if resource is None:
+        return None
+    # ru_maxrss se informa en kilobytes en Linux
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def resumir(nombre: str, cantidad: int, segundos: float, unidad: str, extra: dict = None) -> dict:
+    resultado: dict = {
+        'cantidad': cantidad,
+        'segundos': segundos,
+        'por_segundo': cantidad / segundos if segundos > 0 else 0.0,
+        'unidad': unidad
+    }
+    resultado.update(extra or {})
+    print(f"\n\t{nombre}: {resultado['por_segundo']:.0f} {unidad}/s ({cantidad} en {segundos:.2f} s)"
+          + (f", pico {resultado['memoria_pico_mb']:.1f} MB" if 'memoria_pico_mb' in resultado else ''))
+    return resultado
+
+
+def medir_carga(ruta: str, lineas: int):
+    inicio: float = time.perf_counter()
+    pedidos = cargar_pedidos(ruta)
+    segundos: float = time.perf_counter() - inicio
+    # La memoria se mide en una segunda lectura, tracemalloc hace más lenta la primera
+    del pedidos
+    tracemalloc.start()
+    pedidos = cargar_pedidos(ruta)
+    pico: int = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return pedidos, resumir('carga', lineas, segundos, 'líneas', {'memoria_pico_mb': pico / 2 ** 20,
+                                                                  'pedidos': len(pedidos)})
+
+
+def armar_operaciones(pedidos, cantidad: int, semilla: int) -> list[dict]:
+    generador: random.Random = random.Random(semilla)
+    nros_pedido: list[str] = list(pedidos.keys())
+    operaciones: list[dict] = []
+    for _ in range(cantidad):
+        nro_pedido: str = generador.choice(nros_pedido)
+        eleccion: float = generador.random()
+        if eleccion < 0.4:
+            operaciones.append({"op": "poner_cantidad", "nro": nro_pedido, "codigo": "1334", "color": "azul",
+                                "cantidad": generador.randint(1, 100)})
+        elif eleccion < 0.7:
+            operaciones.append({"op": "modificar", "nro": nro_pedido,
+                                "cambios": {"descuento": generador.choice([0, 5, 10])}})
+        elif eleccion < 0.9:
+            operaciones.append({"op": "crear", "pedido": {**pedidos[nro_pedido].a_dict(), "enviado": False}})
+        else:
+            operaciones.append({"op": "eliminar", "nro": nros_pedido.pop(generador.randrange(len(nros_pedido)))})
+    return operaciones
+
+
+def medir_mutaciones(pedidos, cantidad: int, semilla: int) -> dict:
+    operaciones: list[dict] = armar_operaciones(pedidos, cantidad, semilla)
+    # Las mutaciones pasan por el diario, como en el menú y en los lotes
+    with tempfile.TemporaryDirectory() as carpeta:
+        diario: Diario = Diario(pedidos, 0, carpeta)
+        pedidos.agregar_observador(diario, informar_cargados=False)
+        inicio: float = time.perf_counter()
+        resultado: dict = aplicar_lote(pedidos, operaciones)
+        diario.cerrar()
+        segundos: float = time.perf_counter() - inicio
+        pedidos.observadores.remove(diario)
+    return resumir('mutaciones', resultado['aplicadas'], segundos, 'operaciones',
+                   {'errores': len(resultado['errores'])})
+
+
+def medir_reporte(pedidos, consultas: int, semilla: int) -> dict:
+    generador: random.Random = random.Random(semilla)
+    # La mitad de los pedidos figura como enviada, para que el reporte tenga datos
+    for nro_pedido in list(pedidos.keys())[::2]:
+        pedidos[nro_pedido]["enviado"] = True
+    ciudades: list[str] = [generador.choice(CIUDADES)[0] for _ in range(consultas)]
+    with open(os.devnull, 'w') as nulo, contextlib.redirect_stdout(nulo):
+        inicio: float = time.perf_counter()
+        for ciudad in ciudades:
+            obtener_valor_total_por_ciudad(pedidos, ciudad)
+        segundos: float = time.perf_counter() - inicio
+    return resumir('reporte', consultas, segundos, 'consultas')
+
+
+def medir_listado(pedidos, paginas: int, **filtros) -> dict:
+    inicio: float = time.perf_counter()
+    cursor: str = None
+    for _ in range(paginas):
+        # Al llegar a la última página se vuelve a empezar
+        pagina, cursor = obtener_pagina(pedidos, cursor, **filtros)
+    segundos: float = time.perf_counter() - inicio
+    return resumir('listado' + ''.join(f' {valor}' for valor in filtros.values()), paginas, segundos, 'páginas')
+
+
+def medir_exportacion(pedidos) -> dict:
+    tracemalloc.start()
+    inicio: float = time.perf_counter()
+    with open(os.devnull, 'w', encoding='utf-8') as nulo:
+        cantidad: int = exportar(pedidos, nulo, 'jsonl')
+    segundos: float = time.perf_counter() - inicio
+    pico: int = tracemalloc.get_traced_memory()[1]
+    tracemalloc.stop()
+    return resumir('exportación', cantidad, segundos, 'pedidos', {'memoria_pico_mb': pico / 2 ** 20})
+
+
+def ejecutar(args) -> dict:
+    os.makedirs(args.carpeta, exist_ok=True)
+    resultados: dict = {}
+    for lineas in args.tamanios:
+        ruta: str = f"{args.carpeta}/pedidos-{lineas}.csv"
+        generar_csv(ruta, lineas, args.semilla)
+        print(f"\n\t{lineas} líneas")
+        pedidos, resultados[f'carga-{lineas}'] = medir_carga(ruta, lineas)
+        resultados[f'mutaciones-{lineas}'] = medir_mutaciones(pedidos, args.operaciones, args.semilla)
+        resultados[f'reporte-{lineas}'] = medir_reporte(pedidos, args.consultas, args.semilla)
+        resultados[f'listado-{lineas}'] = medir_listado(pedidos, args.paginas)
+        resultados[f'listado-ciudad-{lineas}'] = medir_listado(pedidos, args.paginas, ciudad=CIUDADES[-1][0])
+        resultados[f'exportacion-{lineas}'] = medir_exportacion(pedidos)
+    resultados['memoria_pico_mb'] = obtener_memoria_pico_mb()
+    return resultados
+
+
+def comparar(resultados: dict, referencia: dict, tolerancia: float = TOLERANCIA) -> list[str]:
+    """Compara la velocidad de cada medición con la de los resultados guardados.
+
+    Args:
+        resultados (dict): Mediciones de esta corrida.
+        referencia (dict): Mediciones guardadas con --guardar-referencia.
+        tolerancia (float): Caída relativa que se acepta sin informar una regresión.
+
+    Returns:
+        list[str]: Las mediciones que bajaron más que la tolerancia.
+    """
+    regresiones: list[str] = []
+    for nombre, resultado in resultados.items():
+        if nombre not in referencia:
+            continue
+        anterior = referencia[nombre]['por_segundo']
+        actual = resultado['por_segundo']
+        cambio = (actual - anterior) / anterior if anterior > 0 else 0.0
+        print(f"\n\t{nombre}: {anterior:.0f} -> {actual:.0f} {resultado['unidad']}/s ({cambio:+.1%})")
+        if cambio < -tolerancia:
+            regresiones.append(nombre)
+    return regresiones
+
+
+def benchmark():
+    parser = argparse.ArgumentParser(description='Benchmark de carga, reportes, listados y mutaciones de pedidos.')
+    parser.add_argument('--tamanios', type=int, nargs='+', default=TAMANIOS, help='líneas de cada archivo generado')
+    parser.add_argument('--semilla', type=int, default=0)
+    parser.add_argument('--carpeta', default='benchmark-datos', help='donde se escriben los archivos generados')
+    parser.add_argument('--operaciones', type=int, default=10000, help='mutaciones por tamaño')
+    parser.add_argument('--consultas', type=int, default=CONSULTAS, help='consultas del reporte por ciudad')
+    parser.add_argument('--paginas', type=int, default=PAGINAS, help='páginas del listado')
+    parser.add_argument('--referencia', default=RUTA_REFERENCIA, help='resultados guardados a comparar')
+    parser.add_argument('--guardar-referencia', action='store_true', help='guardar estos resultados como referencia')
+    parser.add_argument('--tolerancia', type=float, default=TOLERANCIA)
+    args = parser.parse_args()
+
+    resultados = ejecutar(args)
+    if args.guardar_referencia:
+        with open(args.referencia, 'w') as archivo:
+            json.dump(resultados, archivo, indent=4)
+        print(f"\n\tResultados guardados en {args.referencia}")
+    elif os.path.exists(args.referencia):
+        with open(args.referencia) as archivo:
+            regresiones = comparar({nombre: resultado for nombre, resultado in resultados.items()
+                                    if isinstance(resultado, dict)}, json.load(archivo), args.tolerancia)
+        if len(regresiones) > 0:
+            print(f"\n\tRegresiones: {', '.join(regresiones)}")
+            raise SystemExit(1)
+
+
+if __name__ == '__main__':
+    benchmark()
@@ -0,0 +1,393 @@
+import mmap
+import os
+import struct
+import sys
+from array import array
+from collections.abc import Mapping
+from bisect import bisect_left, bisect_right
+from datetime import date
+from heapq import merge
+from agregados import Agregados, GRUPOS
+from almacen import Pedido
+from exportar import escribir_csv
+from indices import CAMPOS_TEXTO, Indices, normalizar, obtener_clave
+
+# Formato binario de los pedidos, en little-endian:
+#   encabezado: marca, versión, número de secuencia del diario y cantidad de textos, pedidos y líneas
+#   cantidad de valores y de entradas de cada índice y cantidad de filas de totales (uint32)
+#   posiciones de cada texto dentro del bloque de textos (uint32, una más que la cantidad de textos)
+#   columnas de los pedidos: nro, fecha, cliente, ciudad y provincia como número de texto (uint32),
+#       descuento (float64), enviado (uint8) y posición de la primera línea (uint32, una más que los pedidos)
+#   columnas de las líneas: código y color como número de texto (uint32) y cantidad (uint32)
+#   bloque de textos en UTF-8
+#   orden: posición de cada pedido ordenando los números de pedido con obtener_clave (uint32)
+#   por cada índice de CAMPOS_INDICE: valores ordenados (uint32: número de texto del valor normalizado, 0 o 1 para
+#       enviado y número de día para la fecha), posición de la primera entrada de cada valor (uint32, uno más que
+#       los valores) y entradas: el lugar de cada pedido en el orden, creciente dentro de cada valor (uint32)
+#   columnas de los totales de los pedidos enviados: grupo (uint32, posición en GRUPOS), valor y código como número
+#       de texto (uint32), cantidad (int64), bruto y neto (float64)
+# Cada sección empieza en una posición múltiplo de ALINEACION.
+MARCA: bytes = b'PEDB'
+VERSION: int = 2
+ENCABEZADO = struct.Struct('<4sHHQIII')
+ALINEACION: int = 8
+COLUMNAS_PEDIDOS: tuple = (("nro", 'I'), ("fecha", 'I'), ("cliente", 'I'), ("ciudad", 'I'), ("provincia", 'I'),
+                           ("descuento", 'd'), ("enviado", 'B'))
+COLUMNAS_LINEAS: tuple = (("codigo", 'I'), ("color", 'I'), ("cantidad", 'I'))
+CAMPOS_INDICE: tuple = CAMPOS_TEXTO + ("enviado", "fecha")
+CONTEOS = struct.Struct('<' + 'I' * (2 * len(CAMPOS_INDICE) + 1))
+COLUMNAS_TOTALES: tuple = (("grupo", 'I'), ("valor", 'I'), ("codigo", 'I'), ("cantidad", 'q'), ("bruto", 'd'),
+                           ("neto", 'd'))
+
+
+def alinear(posicion: int) -> int:
+    return (posicion + ALINEACION - 1) // ALINEACION * ALINEACION
+
+
+def escribir_binario(ruta: str, pedidos_recorridos, obtener_precio, sec: int = 0) -> None:
+    """Guarda los pedidos en el formato binario, junto con sus índices y los totales de los pedidos enviados.
+
+    Args:
+        ruta (str): Archivo de destino.
+        pedidos_recorridos: Pares (número de pedido, pedido), por ejemplo los items() de un almacén.
+        obtener_precio: Función que devuelve el precio de un código de artículo, para calcular los totales.
+        sec (int): Número de secuencia del diario incluido en los pedidos.
+    """
+    ids_textos: dict = {}
+
+    def obtener_id(texto: str) -> int:
+        return ids_textos.setdefault(texto, len(ids_textos))
+
+    columnas: dict = {nombre: array(tipo) for nombre, tipo in COLUMNAS_PEDIDOS + COLUMNAS_LINEAS}
+    primera_linea: array = array('I', [0])
+    claves: list[str] = []
+    # Valor de cada pedido en cada índice, None si no se indexa (una fecha inválida)
+    valores: dict = {campo: [] for campo in CAMPOS_INDICE}
+    indices: Indices = Indices()
+    agregados: Agregados = Agregados(obtener_precio)
+    for nro_pedido, pedido in pedidos_recorridos:
+        columnas["nro"].append(obtener_id(nro_pedido))
+        for campo in ("fecha", "cliente", "ciudad", "provincia"):
+            columnas[campo].append(obtener_id(pedido[campo]))
+        columnas["descuento"].append(pedido["descuento"])
+        columnas["enviado"].append(bool(pedido["enviado"]))
+        for codigo, color, cantidad in pedido.recorrer_lineas():
+            columnas["codigo"].append(obtener_id(codigo))
+            columnas["color"].append(obtener_id(color))
+            columnas["cantidad"].append(cantidad)
+        primera_linea.append(len(columnas["cantidad"]))
+        claves.append(obtener_clave(nro_pedido))
+        for campo in CAMPOS_TEXTO:
+            valores[campo].append(normalizar(pedido[campo]))
+        valores["enviado"].append(int(bool(pedido["enviado"])))
+        fecha = indices.convertir_fecha(pedido["fecha"])
+        valores["fecha"].append(None if fecha is None else fecha.toordinal())
+        agregados.alta(nro_pedido, pedido)
+
+    orden: array = array('I', sorted(range(len(claves)), key=claves.__getitem__))
+    conteos: list[int] = []
+    secciones_indices: list = []
+    for campo in CAMPOS_INDICE:
+        por_valor: dict = {}
+        for lugar, posicion in enumerate(orden):
+            valor = valores[campo][posicion]
+            if valor is not None:
+                por_valor.setdefault(valor, array('I')).append(lugar)
+        valores_ordenados: list = sorted(por_valor)
+        columna_valores: array = array('I', [obtener_id(valor) if campo in CAMPOS_TEXTO else valor
+                                             for valor in valores_ordenados])
+        inicios: array = array('I', [0])
+        entradas: array = array('I')
+        for valor in valores_ordenados:
+            entradas.extend(por_valor[valor])
+            inicios.append(len(entradas))
+        conteos += [len(valores_ordenados), len(entradas)]
+        secciones_indices += [columna_valores, inicios, entradas]
+    columnas_totales: dict = {nombre: array(tipo) for nombre, tipo in COLUMNAS_TOTALES}
+    for numero_grupo, grupo in enumerate(GRUPOS):
+        for valor, articulos in agregados.totales[grupo].items():
+            for codigo, item in articulos.items():
+                for nombre, dato in (("grupo", numero_grupo), ("valor", obtener_id(valor)),
+                                     ("codigo", obtener_id(codigo)), ("cantidad", item["cantidad"]),
+                                     ("bruto", item["bruto"]), ("neto", item["neto"])):
+                    columnas_totales[nombre].append(dato)
+    conteos.append(len(columnas_totales["grupo"]))
+
+    textos: list[bytes] = [texto.encode('utf-8') for texto in ids_textos]
+    posiciones_textos: array = array('I', [0])
+    for texto in textos:
+        posiciones_textos.append(posiciones_textos[-1] + len(texto))
+    secciones: list = [posiciones_textos]
+    secciones += [columnas[nombre] for nombre, _ in COLUMNAS_PEDIDOS] + [primera_linea]
+    secciones += [columnas[nombre] for nombre, _ in COLUMNAS_LINEAS]
+    secciones.append(b''.join(textos))
+    secciones += [orden] + secciones_indices + [columnas_totales[nombre] for nombre, _ in COLUMNAS_TOTALES]
+
+    if sys.byteorder != 'little':
+        for seccion in secciones:
+            if isinstance(seccion, array):
+                seccion.byteswap()
+    with open(ruta, 'wb') as archivo:
+        archivo.write(ENCABEZADO.pack(MARCA, VERSION, 0, sec, len(textos), len(columnas["nro"]),
+                                      len(columnas["cantidad"])))
+        archivo.write(CONTEOS.pack(*conteos))
+        for seccion in secciones:
+            archivo.write(bytes(alinear(archivo.tell()) - archivo.tell()))
+            archivo.write(seccion)
+        archivo.flush()
+        os.fsync(archivo.fileno())
+
+
+class PedidosBinarios(Mapping):
+    """Pedidos de un archivo binario abierto con mmap.
+
+    Abrirlo solo lee el encabezado; cada pedido se decodifica al accederlo y los textos se decodifican una
+    sola vez. Los pedidos devueltos son registros Pedido independientes, los cambios no se guardan en el archivo.
+    Los pedidos se buscan por número con una búsqueda binaria y los índices y totales se consultan sin recorrer
+    los pedidos; ver recorrer(), contar() y obtener_totales().
+    """
+
+    def __init__(self, ruta: str):
+        with open(ruta, 'rb') as archivo:
+            self.mapa = mmap.mmap(archivo.fileno(), 0, access=mmap.ACCESS_READ)
+        marca, self.version, _, self.sec, n_textos, n_pedidos, n_lineas = ENCABEZADO.unpack_from(self.mapa)
+        if marca != MARCA or self.version != VERSION:
+            self.mapa.close()
+            raise ValueError(f"'{ruta}' no es un archivo de pedidos en formato binario versión {VERSION}.")
+        if sys.byteorder != 'little':
+            self.mapa.close()
+            raise ValueError("El formato binario solo se puede abrir en equipos little-endian.")
+        vista = memoryview(self.mapa)
+        conteos: tuple = CONTEOS.unpack_from(self.mapa, ENCABEZADO.size)
+        posicion: int = ENCABEZADO.size + CONTEOS.size
+
+        def leer_columna(tipo: str, cantidad: int) -> memoryview:
+            nonlocal posicion
+            posicion = alinear(posicion)
+            tamanio: int = cantidad * array(tipo).itemsize
+            columna = vista[posicion:posicion + tamanio].cast(tipo)
+            posicion += tamanio
+            return columna
+
+        self.posiciones_textos = leer_columna('I', n_textos + 1)
+        self.columnas: dict = {nombre: leer_columna(tipo, n_pedidos) for nombre, tipo in COLUMNAS_PEDIDOS}
+        self.primera_linea = leer_columna('I', n_pedidos + 1)
+        self.columnas.update({nombre: leer_columna(tipo, n_lineas) for nombre, tipo in COLUMNAS_LINEAS})
+        self.textos = leer_columna('B', self.posiciones_textos[-1])
+        self.orden = leer_columna('I', n_pedidos)
+        # Por cada campo indexado: (valores, posición de la primera entrada de cada valor, entradas)
+        self.indices: dict = {}
+        for numero, campo in enumerate(CAMPOS_INDICE):
+            n_valores, n_entradas = conteos[2 * numero], conteos[2 * numero + 1]
+            self.indices[campo] = (leer_columna('I', n_valores), leer_columna('I', n_valores + 1),
+                                   leer_columna('I', n_entradas))
+        # Columnas de los totales, aparte porque comparten nombres con las columnas de las líneas
+        self.totales: dict = {nombre: leer_columna(tipo, conteos[-1]) for nombre, tipo in COLUMNAS_TOTALES}
+        self.cantidad: int = n_pedidos
+        self.decodificados: dict = {}
+
+    def obtener_texto(self, id_texto: int) -> str:
+        texto = self.decodificados.get(id_texto)
+        if texto is None:
+            inicio, fin = self.posiciones_textos[id_texto], self.posiciones_textos[id_texto + 1]
+            texto = sys.intern(bytes(self.textos[inicio:fin]).decode('utf-8'))
+            self.decodificados[id_texto] = texto
+        return texto
+
+    def obtener_pedido(self, posicion: int) -> Pedido:
+        columnas: dict = self.columnas
+        pedido: Pedido = Pedido(*(self.obtener_texto(columnas[campo][posicion])
+                                  for campo in ("fecha", "cliente", "ciudad", "provincia")),
+                                productos={}, descuento=columnas["descuento"][posicion],
+                                enviado=bool(columnas["enviado"][posicion]))
+        for i in range(self.primera_linea[posicion], self.primera_linea[posicion + 1]):
+            pedido.agregar_linea(self.obtener_texto(columnas["codigo"][i]), self.obtener_texto(columnas["color"][i]),
+                                 columnas["cantidad"][i])
+        return pedido
+
+    def obtener_nro(self, lugar: int) -> str:
+        """Devuelve el número del pedido que ocupa un lugar en el orden de los números de pedido."""
+        return self.obtener_texto(self.columnas["nro"][self.orden[lugar]])
+
+    def contar_hasta(self, clave: str) -> int:
+        """Devuelve cuántos números de pedido tienen una clave menor o igual a la indicada."""
+        inicio, fin = 0, self.cantidad
+        while inicio < fin:
+            medio: int = (inicio + fin) // 2
+            if obtener_clave(self.obtener_nro(medio)) <= clave:
+                inicio = medio + 1
+            else:
+                fin = medio
+        return inicio
+
+    def buscar(self, nro_pedido: str):
+        """Devuelve la posición de un pedido en el archivo, o None si no está."""
+        lugar: int = self.contar_hasta(obtener_clave(nro_pedido)) - 1
+        if lugar >= 0 and self.obtener_nro(lugar) == nro_pedido:
+            return self.orden[lugar]
+        return None
+
+    def obtener_entradas(self, campo: str, valor):
+        """Devuelve los lugares, en el orden de los números de pedido, de los pedidos con un valor en un campo.
+
+        Args:
+            campo (str): ciudad, provincia, cliente, enviado o fecha.
+            valor: Valor buscado, sin importar mayúsculas en los campos de texto. Las fechas son date.
+        """
+        valores, inicios, entradas = self.indices[campo]
+        if campo == "fecha":
+            buscado, obtener = valor.toordinal(), int
+        elif campo == "enviado":
+            buscado, obtener = int(bool(valor)), int
+        else:
+            buscado, obtener = normalizar(valor), self.obtener_texto
+        inicio, fin = 0, len(valores)
+        while inicio < fin:
+            medio: int = (inicio + fin) // 2
+            if obtener(valores[medio]) < buscado:
+                inicio = medio + 1
+            else:
+                fin = medio
+        if inicio == len(valores) or obtener(valores[inicio]) != buscado:
+            return entradas[0:0]
+        return entradas[inicios[inicio]:inicios[inicio + 1]]
+
+    def contar(self, campo: str, valor) -> int:
+        return len(self.obtener_entradas(campo, valor))
+
+    def recorrer(self, campo: str = None, valor=None, despues_de: str = None):
+        """Recorre en orden, a partir de un cursor, los números de los pedidos con determinado valor en un campo.
+
+        Args:
+            campo (str): ciudad, provincia, cliente, enviado o fecha. None para recorrer todos los pedidos.
+            valor: Valor buscado.
+            despues_de (str): Cursor, el último número de pedido ya recorrido.
+
+        Returns:
+            Generador de números de pedido.
+        """
+        corte: int = 0 if despues_de is None else self.contar_hasta(obtener_clave(despues_de))
+        if campo is None:
+            lugares = range(corte, self.cantidad)
+        else:
+            entradas = self.obtener_entradas(campo, valor)
+            lugares = entradas[bisect_left(entradas, corte):]
+        for lugar in lugares:
+            yield self.obtener_nro(lugar)
+
+    def obtener_rango_fechas(self, desde: date, hasta: date) -> range:
+        """Devuelve las posiciones, dentro de los valores del índice de fechas, de las fechas entre desde y hasta."""
+        valores = self.indices["fecha"][0]
+        return range(bisect_left(valores, desde.toordinal()), bisect_right(valores, hasta.toordinal()))
+
+    def contar_fechas(self, desde: date, hasta: date) -> int:
+        inicios = self.indices["fecha"][1]
+        rango: range = self.obtener_rango_fechas(desde, hasta)
+        return inicios[rango.stop] - inicios[rango.start]
+
+    def recorrer_fechas(self, desde: date, hasta: date, despues_de: str = None):
+        """Recorre en orden, a partir de un cursor, los números de los pedidos con fecha entre desde y hasta
+        (inclusive). Los lugares de cada fecha ya están ordenados y se combinan sin decodificar los números.
+
+        Returns:
+            Generador de números de pedido.
+        """
+        _, inicios, entradas = self.indices["fecha"]
+        corte: int = 0 if despues_de is None else self.contar_hasta(obtener_clave(despues_de))
+        recorridos: list = []
+        for posicion in self.obtener_rango_fechas(desde, hasta):
+            lugares = entradas[inicios[posicion]:inicios[posicion + 1]]
+            recorridos.append(lugares[bisect_left(lugares, corte):])
+        for lugar in merge(*recorridos):
+            yield self.obtener_nro(lugar)
+
+    def obtener_totales(self) -> dict:
+        """Devuelve los totales de los pedidos enviados guardados en el archivo.
+
+        Returns:
+            dict: {grupo: {valor: {código: {"cantidad": n, "bruto": x, "neto": y}}}}, como Agregados.totales.
+        """
+        columnas: dict = self.totales
+        totales: dict = {grupo: {} for grupo in GRUPOS}
+        for fila in range(len(columnas["grupo"])):
+            articulos: dict = totales[GRUPOS[columnas["grupo"][fila]]].setdefault(
+                self.obtener_texto(columnas["valor"][fila]), {})
+            articulos[self.obtener_texto(columnas["codigo"][fila])] = {
+                campo: columnas[campo][fila] for campo in ("cantidad", "bruto", "neto")}
+        return totales
+
+    def __getitem__(self, nro_pedido: str) -> Pedido:
+        posicion = self.buscar(nro_pedido)
+        if posicion is None:
+            raise KeyError(nro_pedido)
+        return self.obtener_pedido(posicion)
+
+    def __contains__(self, nro_pedido) -> bool:
+        return isinstance(nro_pedido, str) and self.buscar(nro_pedido) is not None
+
+    def __iter__(self):
+        for posicion in range(self.cantidad):
+            yield self.obtener_texto(self.columnas["nro"][posicion])
+
+    def __len__(self) -> int:
+        return self.cantidad
+
+    def items(self):
+        # Recorre en orden sin armar el índice por número de pedido
+        for posicion in range(self.cantidad):
+            yield self.obtener_texto(self.columnas["nro"][posicion]), self.obtener_pedido(posicion)
+
+    def cerrar(self) -> None:
+        self.posiciones_textos = self.primera_linea = self.textos = self.orden = None
+        for columna in list(self.columnas.values()) + list(self.totales.values()):
+            columna.release()
+        for columnas in self.indices.values():
+            for columna in columnas:
+                columna.release()
+        self.columnas = {}
+        self.totales = {}
+        self.indices = {}
+        try:
+            self.mapa.close()
+        except BufferError:
+            # Todavía hay un recorrido sin terminar, el mapa se libera cuando se descarte
+            pass
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.cerrar()
+
+
+def binario_a_csv(origen: str, destino: str) -> None:
+    """Convierte un archivo binario de pedidos al formato .csv original, una fila por artículo y color.
+    El estado de envío no forma parte del .csv y se pierde.
+
+    Args:
+        origen (str): Archivo binario.
+        destino (str): Archivo .csv a escribir.
+    """
+    with PedidosBinarios(origen) as pedidos, open(destino, 'w', newline='', encoding='utf-8') as archivo_csv:
+        escribir_csv(pedidos.items(), archivo_csv)
+
+
+def csv_a_binario(origen: str, destino: str) -> None:
+    """Convierte un archivo .csv de pedidos al formato binario.
+
+    Args:
+        origen (str): Archivo .csv.
+        destino (str): Archivo binario a escribir.
+    """
+    from main import cargar_pedidos, obtener_precio
+    escribir_binario(destino, cargar_pedidos(origen).items(), obtener_precio)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) != 3:
+        print("\n\tUso: python binario.py <origen.csv|origen.bin> <destino.bin|destino.csv>")
+        sys.exit(1)
+    if sys.argv[1].endswith('.csv'):
+        csv_a_binario(sys.argv[1], sys.argv[2])
+    else:
+        binario_a_csv(sys.argv[1], sys.argv[2])
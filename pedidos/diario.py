@@ -0,0 +1,260 @@
+import json
+import os
+import threading
+from binario import PedidosBinarios, escribir_binario
+
+# Carpeta donde se guardan el diario de cambios y la última copia completa de los pedidos
+CARPETA_DATOS: str = 'datos'
+ARCHIVO_DIARIO: str = 'diario.jsonl'
+# Diario anterior a la copia completa que se está guardando, se borra cuando la copia la reemplaza
+ARCHIVO_DIARIO_ANTERIOR: str = 'diario.anterior.jsonl'
+ARCHIVO_SNAPSHOT: str = 'snapshot.bin'
+# Cada registro se entrega al sistema operativo al escribirlo, así que sobrevive a un corte del programa.
+# Además se baja a disco cada tantos registros o, a más tardar, tantos segundos después de escribirlo.
+# Ante un corte de luz se pueden perder, como mucho, los cambios de ese último grupo.
+GRUPO_FSYNC: int = 64
+INTERVALO_FSYNC: float = 1.0
+# Cantidad de cambios después de la cual se guarda una copia completa y se vacía el diario
+SNAPSHOT_CADA: int = 10000
+
+
+def leer_registros(ruta: str):
+    """Recorre las líneas JSON de un archivo, ignorando la última si quedó cortada.
+
+    Args:
+        ruta (str): Ruta del archivo.
+
+    Returns:
+        Generador de los registros leídos.
+    """
+    with open(ruta, encoding='utf-8') as archivo:
+        for linea in archivo:
+            try:
+                yield json.loads(linea)
+            except ValueError:
+                # Solo la última línea puede quedar a medio escribir si el programa se cortó
+                return
+
+
+def leer_snapshot(carpeta: str = CARPETA_DATOS):
+    """Abre la última copia completa de los pedidos, guardada en el formato binario.
+    Los pedidos no se cargan en memoria: el almacén los lee del archivo al accederlos.
+
+    Args:
+        carpeta (str): Carpeta de los datos.
+
+    Returns:
+        PedidosBinarios: La copia abierta, o None si no existe una copia.
+    """
+    ruta: str = f"{carpeta}/{ARCHIVO_SNAPSHOT}"
+    if not os.path.exists(ruta):
+        return None
+    return PedidosBinarios(ruta)
+
+
+def reproducir(pedidos, desde: int, carpeta: str = CARPETA_DATOS) -> int:
+    """Aplica al almacén los cambios del diario posteriores a la copia completa.
+
+    Args:
+        pedidos (Pedidos): Almacén con los pedidos de la copia completa.
+        desde (int): Número de secuencia de la copia completa. Los cambios anteriores ya están incluidos.
+        carpeta (str): Carpeta de los datos.
+
+    Returns:
+        int: Número de secuencia del último cambio aplicado.
+    """
+    sec: int = desde
+    for archivo in (ARCHIVO_DIARIO_ANTERIOR, ARCHIVO_DIARIO):
+        ruta: str = f"{carpeta}/{archivo}"
+        if not os.path.exists(ruta):
+            continue
+        for registro in leer_registros(ruta):
+            if registro["sec"] <= desde:
+                continue
+            if registro["op"] == "put":
+                pedidos[registro["nro"]] = registro["pedido"]
+            elif registro["nro"] in pedidos:
+                del pedidos[registro["nro"]]
+            sec = registro["sec"]
+    return sec
+
+
+def juntar_diarios(carpeta: str = CARPETA_DATOS) -> None:
+    """Junta en el diario los cambios de un diario anterior que quedó de una copia completa sin terminar.
+
+    Args:
+        carpeta (str): Carpeta de los datos.
+    """
+    anterior: str = f"{carpeta}/{ARCHIVO_DIARIO_ANTERIOR}"
+    if not os.path.exists(anterior):
+        return
+    ruta: str = f"{carpeta}/{ARCHIVO_DIARIO}"
+    with open(f"{ruta}.tmp", 'w', encoding='utf-8') as juntos:
+        for archivo in (anterior, ruta):
+            if os.path.exists(archivo):
+                # Se vuelven a escribir los registros leídos, sin la última línea cortada de cada archivo
+                for registro in leer_registros(archivo):
+                    juntos.write(json.dumps(registro, ensure_ascii=False) + '\n')
+        juntos.flush()
+        os.fsync(juntos.fileno())
+    os.replace(f"{ruta}.tmp", ruta)
+    os.remove(anterior)
+
+
+class Diario:
+    """Diario de cambios de los pedidos, en un archivo al que solo se agregan líneas.
+
+    Es un observador del almacén. Cada alta se guarda como un registro "put" con el pedido completo y cada
+    baja como un registro "del". La baja que precede al alta de una modificación no se escribe, porque el
+    "put" siguiente ya reemplaza el pedido. La bajada a disco por tiempo la hace un temporizador en otro hilo.
+    """
+
+    def __init__(self, pedidos, sec: int = 0, carpeta: str = CARPETA_DATOS, grupo_fsync: int = GRUPO_FSYNC,
+                 intervalo_fsync: float = INTERVALO_FSYNC, snapshot_cada: int = SNAPSHOT_CADA):
+        os.makedirs(carpeta, exist_ok=True)
+        self.pedidos = pedidos
+        self.sec: int = sec
+        self.carpeta: str = carpeta
+        self.grupo_fsync: int = grupo_fsync
+        self.intervalo_fsync: float = intervalo_fsync
+        self.snapshot_cada: int = snapshot_cada
+        juntar_diarios(carpeta)
+        self.archivo = open(f"{carpeta}/{ARCHIVO_DIARIO}", 'a', encoding='utf-8')
+        # Diario anterior a la copia completa en curso, hasta bajar a disco sus últimos registros
+        self.archivo_anterior = None
+        # Si hay una copia completa en curso, entre preparar_snapshot() y terminar_snapshot()
+        self.copiando: bool = False
+        self.sin_sincronizar: int = 0
+        self.cambios: int = 0
+        # Baja de una modificación, que se descarta cuando llega el alta del mismo pedido
+        self.baja_pendiente: str = None
+        # Protege el archivo y la cuenta de registros sin bajar a disco, que también usa el temporizador.
+        # La bajada a disco toma otro bloqueo, así las escrituras no esperan al disco.
+        self.bloqueo: threading.Lock = threading.Lock()
+        self.bloqueo_disco: threading.Lock = threading.Lock()
+        self.temporizador: threading.Timer = None
+        # Si es True, escribir() nunca espera al disco ni guarda la copia completa: de eso se encarga quien usa
+        # el diario desde otro hilo, ver sincronizar(), preparar_snapshot() y escribir_snapshot()
+        self.solo_escribir: bool = False
+
+    def escribir(self, registro: dict) -> None:
+        self.sec += 1
+        registro["sec"] = self.sec
+        with self.bloqueo:
+            self.archivo.write(json.dumps(registro, ensure_ascii=False) + '\n')
+            self.archivo.flush()
+            self.cambios += 1
+            self.sin_sincronizar += 1
+            completo: bool = self.sin_sincronizar >= self.grupo_fsync and not self.solo_escribir
+            if not completo and self.temporizador is None:
+                self.temporizador = threading.Timer(self.intervalo_fsync, self.sincronizar_por_tiempo)
+                self.temporizador.daemon = True
+                self.temporizador.start()
+        if completo:
+            self.sincronizar()
+
+    def sincronizar_por_tiempo(self) -> None:
+        with self.bloqueo:
+            self.temporizador = None
+        self.sincronizar()
+
+    def escribir_baja_pendiente(self) -> None:
+        if self.baja_pendiente is not None:
+            nro_pedido: str = self.baja_pendiente
+            self.baja_pendiente = None
+            self.escribir({"op": "del", "nro": nro_pedido})
+
+    def alta(self, nro_pedido: str, pedido) -> None:
+        if self.baja_pendiente != nro_pedido:
+            self.escribir_baja_pendiente()
+        self.baja_pendiente = None
+        self.escribir({"op": "put", "nro": nro_pedido, "pedido": pedido.a_dict()})
+        # Después de un alta el almacén no tiene cambios a medias, es el momento de copiarlo
+        if not self.solo_escribir and self.necesita_snapshot():
+            self.guardar_snapshot()
+
+    def baja(self, nro_pedido: str, pedido) -> None:
+        self.escribir_baja_pendiente()
+        if getattr(self.pedidos, "modificando", None) == nro_pedido:
+            self.baja_pendiente = nro_pedido
+        else:
+            self.escribir({"op": "del", "nro": nro_pedido})
+
+    def sincronizar(self) -> None:
+        """Baja a disco los cambios escritos hasta el momento. Se puede llamar desde otro hilo."""
+        with self.bloqueo_disco:
+            with self.bloqueo:
+                if self.archivo.closed:
+                    return
+                self.archivo.flush()
+                pendientes: int = self.sin_sincronizar
+                self.sin_sincronizar = 0
+                descriptor: int = self.archivo.fileno()
+                anterior, self.archivo_anterior = self.archivo_anterior, None
+            # Mientras el disco confirma, se pueden seguir escribiendo registros
+            if anterior is not None:
+                # Puede tener los últimos registros antes de la copia completa, todavía sin bajar a disco
+                if pendientes > 0:
+                    os.fsync(anterior.fileno())
+                anterior.close()
+            if pendientes > 0:
+                os.fsync(descriptor)
+
+    def necesita_snapshot(self) -> bool:
+        return self.cambios >= self.snapshot_cada and not self.copiando
+
+    def guardar_snapshot(self) -> None:
+        """Guarda una copia completa de los pedidos, pasa a leerlos de ella y vacía el diario."""
+        copia, sec = self.preparar_snapshot()
+        self.escribir_snapshot(copia, sec)
+        self.terminar_snapshot()
+        self.sincronizar()
+
+    def preparar_snapshot(self):
+        """Congela los pedidos para copiarlos y empieza un diario nuevo para los cambios siguientes.
+        El diario actual queda aparte hasta que la copia lo reemplace. No espera al disco.
+
+        Returns:
+            (generador, int): Los pedidos a copiar y el número de secuencia del último cambio que incluyen.
+        """
+        self.escribir_baja_pendiente()
+        ruta: str = f"{self.carpeta}/{ARCHIVO_DIARIO}"
+        with self.bloqueo:
+            self.archivo.flush()
+            os.replace(ruta, f"{self.carpeta}/{ARCHIVO_DIARIO_ANTERIOR}")
+            # Lo cierra la próxima bajada a disco, después de bajar sus últimos registros
+            self.archivo_anterior = self.archivo
+            self.archivo = open(ruta, 'a', encoding='utf-8')
+            self.cambios = 0
+        self.copiando = True
+        return self.pedidos.congelar(), self.sec
+
+    def escribir_snapshot(self, copia, sec: int) -> None:
+        """Escribe la copia congelada, reemplaza a la anterior y borra el diario anterior, que ya está incluido.
+        Es la parte lenta y no usa el almacén, así que se puede llamar desde otro hilo.
+        """
+        ruta: str = f"{self.carpeta}/{ARCHIVO_SNAPSHOT}"
+        escribir_binario(f"{ruta}.tmp", copia, self.pedidos.agregados.obtener_precio, sec)
+        # La copia reemplaza a la anterior de una sola vez. Si el programa se corta antes de borrar el diario
+        # anterior, al reproducirlo se saltean los cambios ya copiados.
+        os.replace(f"{ruta}.tmp", ruta)
+        os.remove(f"{self.carpeta}/{ARCHIVO_DIARIO_ANTERIOR}")
+
+    def terminar_snapshot(self) -> None:
+        """Pasa a leer los pedidos de la copia nueva. Se llama desde el hilo que modifica el almacén."""
+        anterior = self.pedidos.base
+        self.pedidos.cambiar_base(PedidosBinarios(f"{self.carpeta}/{ARCHIVO_SNAPSHOT}"))
+        if anterior is not None:
+            anterior.cerrar()
+        self.copiando = False
+
+    def cerrar(self) -> None:
+        self.escribir_baja_pendiente()
+        with self.bloqueo:
+            temporizador, self.temporizador = self.temporizador, None
+        if temporizador is not None:
+            temporizador.cancel()
+            temporizador.join()
+        self.sincronizar()
+        with self.bloqueo_disco, self.bloqueo:
+            self.archivo.close()
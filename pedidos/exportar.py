@@ -0,0 +1,232 @@
+import argparse
+import csv
+import json
+import os
+import sys
+from datetime import date, datetime
+from itertools import islice
+from indices import FORMATO_FECHA, normalizar, ordenar
+
+# Pedidos por página en el listado del menú y en el formato de páginas
+TAMANIO_PAGINA: int = 10
+FORMATOS: list = ['jsonl', 'csv', 'paginas']
+ENCABEZADO_CSV: list[str] = ["Nro. Pedido", " Fecha", " Cliente", " Ciudad", " Provincia", " Cod. Artículo", " Color",
+                             " Cantidad", " Descuento"]
+
+
+def convertir_fecha(fecha):
+    if fecha is None or isinstance(fecha, date):
+        return fecha
+    return datetime.strptime(fecha, FORMATO_FECHA).date()
+
+
+def cumple_filtros(pedido, enviado: bool = None, ciudad: str = None, desde: date = None, hasta: date = None,
+                   convertir=convertir_fecha) -> bool:
+    if enviado is not None and bool(pedido["enviado"]) != enviado:
+        return False
+    if ciudad is not None and normalizar(pedido["ciudad"]) != normalizar(ciudad):
+        return False
+    if desde is not None or hasta is not None:
+        try:
+            fecha: date = convertir(pedido["fecha"])
+        except ValueError:
+            return False
+        if fecha is None or (desde is not None and fecha < desde) or (hasta is not None and fecha > hasta):
+            return False
+    return True
+
+
+def seleccionar(_pedidos, enviado: bool = None, ciudad: str = None, desde=None, hasta=None, despues_de: str = None):
+    """Recorre, en orden y a partir de un cursor, los números de los pedidos que cumplen los filtros.
+    Con un almacén se recorre el índice más chico de los filtros pedidos y el resto se verifica en cada pedido, así
+    una página cuesta en proporción a su tamaño. Con otros mapeos, como un archivo binario, se recorren los pedidos.
+
+    Args:
+        _pedidos: Pedidos a filtrar.
+        enviado (bool): Estado de envío buscado, None para no filtrar.
+        ciudad (str): Ciudad buscada, sin importar mayúsculas, None para no filtrar.
+        desde: Fecha mínima, date o texto dd/mm/yyyy, inclusive.
+        hasta: Fecha máxima, date o texto dd/mm/yyyy, inclusive.
+        despues_de (str): Cursor, el último número de pedido ya recorrido. None para empezar desde el principio.
+
+    Returns:
+        Generador de los números de pedido, en el orden en que se listan.
+    """
+    desde, hasta = convertir_fecha(desde), convertir_fecha(hasta)
+    indices = getattr(_pedidos, "indices", None)
+    if indices is None:
+        nros_pedido: list[str] = ordenar(nro for nro, pedido in _pedidos.items()
+                                         if cumple_filtros(pedido, enviado, ciudad, desde, hasta))
+        yield from nros_pedido[0 if despues_de is None else buscar_cursor(nros_pedido, despues_de):]
+        return
+    opciones: list[tuple] = []
+    if enviado is not None:
+        opciones.append((indices.contar("enviado", enviado), "enviado", enviado))
+    if ciudad is not None:
+        opciones.append((indices.contar("ciudad", ciudad), "ciudad", ciudad))
+    if desde is not None or hasta is not None:
+        desde, hasta = desde or date.min, hasta or date.max
+        opciones.append((indices.contar_fechas(desde, hasta), "fecha", None))
+    if len(opciones) == 0:
+        yield from indices.recorrer(despues_de=despues_de)
+        return
+    _, campo, valor = min(opciones, key=lambda opcion: opcion[0])
+    if campo == "fecha":
+        nros_pedido = indices.recorrer_fechas(desde, hasta, despues_de)
+    else:
+        nros_pedido = indices.recorrer(campo, valor, despues_de)
+    for nro_pedido in nros_pedido:
+        if len(opciones) == 1 or cumple_filtros(_pedidos[nro_pedido], enviado, ciudad, desde, hasta,
+                                                indices.convertir_fecha):
+            yield nro_pedido
+
+
+def buscar_cursor(nros_pedido: list[str], despues_de: str) -> int:
+    """Devuelve la posición del primer número de pedido posterior al cursor, con una búsqueda binaria."""
+    clave: tuple = (len(despues_de), despues_de)
+    inicio, fin = 0, len(nros_pedido)
+    while inicio < fin:
+        medio: int = (inicio + fin) // 2
+        if (len(nros_pedido[medio]), nros_pedido[medio]) <= clave:
+            inicio = medio + 1
+        else:
+            fin = medio
+    return inicio
+
+
+def recorrer(_pedidos, nros_pedido, limite: int = None):
+    """Recorre los pedidos indicados, decodificando uno por vez.
+
+    Args:
+        _pedidos: Pedidos a recorrer.
+        nros_pedido: Números de pedido en orden, como los devuelve seleccionar().
+        limite (int): Cantidad máxima de pedidos, None para recorrer todos.
+
+    Returns:
+        Generador de tuplas (número de pedido, pedido).
+    """
+    for nro_pedido in islice(nros_pedido, limite):
+        yield nro_pedido, _pedidos[nro_pedido]
+
+
+def obtener_pagina(_pedidos, despues_de: str = None, limite: int = TAMANIO_PAGINA, **filtros):
+    """Devuelve una página de pedidos y el cursor para pedir la siguiente.
+
+    Args:
+        _pedidos: Pedidos a listar.
+        despues_de (str): Cursor, el último número de pedido de la página anterior.
+        limite (int): Cantidad de pedidos de la página.
+        **filtros: enviado, ciudad, desde y hasta, como en seleccionar().
+
+    Returns:
+        (list, str): Los pares (número de pedido, pedido) de la página y el cursor, None si no hay más pedidos.
+
+    Raises:
+        ValueError: Si el límite no es positivo.
+    """
+    if limite < 1:
+        raise ValueError(f"El límite {limite} debe ser un número entero positivo.")
+    # Se busca un pedido de más para saber si hay otra página
+    nros_pedido: list[str] = list(islice(seleccionar(_pedidos, despues_de=despues_de, **filtros), limite + 1))
+    pagina: list = list(recorrer(_pedidos, nros_pedido, limite))
+    return pagina, pagina[-1][0] if len(nros_pedido) > limite else None
+
+
+def obtener_filas_csv(nro_pedido: str, pedido) -> list[list]:
+    """Devuelve las filas .csv de un pedido, una por artículo y color, con la estructura que lee cargar_pedidos."""
+    descuento: float = pedido["descuento"]
+    return [[nro_pedido, pedido["fecha"], pedido["cliente"], pedido["ciudad"], pedido["provincia"], codigo,
+             color.capitalize(), cantidad, int(descuento) if float(descuento).is_integer() else descuento]
+            for codigo, color, cantidad in pedido.recorrer_lineas()]
+
+
+def escribir_jsonl(pedidos_recorridos, archivo) -> int:
+    cantidad: int = 0
+    for nro_pedido, pedido in pedidos_recorridos:
+        archivo.write(json.dumps({"nro": nro_pedido, **pedido.a_dict()}, ensure_ascii=False) + '\n')
+        cantidad += 1
+    return cantidad
+
+
+def escribir_csv(pedidos_recorridos, archivo) -> int:
+    escritor = csv.writer(archivo, delimiter=',')
+    escritor.writerow(ENCABEZADO_CSV)
+    cantidad: int = 0
+    for nro_pedido, pedido in pedidos_recorridos:
+        escritor.writerows(obtener_filas_csv(nro_pedido, pedido))
+        cantidad += 1
+    return cantidad
+
+
+def escribir_pagina(pagina: list, archivo) -> None:
+    for nro_pedido, pedido in pagina:
+        texto: str = json.dumps(pedido.a_dict(), indent=4, ensure_ascii=False)
+        archivo.write(f'"{nro_pedido}": {texto}\n')
+
+
+def escribir_paginas(pedidos_recorridos, archivo, tamanio_pagina: int = TAMANIO_PAGINA) -> int:
+    cantidad: int = 0
+    pagina: list = []
+    for item in pedidos_recorridos:
+        pagina.append(item)
+        cantidad += 1
+        if len(pagina) == tamanio_pagina:
+            archivo.write(f"\n--- Página {(cantidad - 1) // tamanio_pagina + 1} ---\n")
+            escribir_pagina(pagina, archivo)
+            pagina = []
+    if len(pagina) > 0:
+        archivo.write(f"\n--- Página {(cantidad - 1) // tamanio_pagina + 1} ---\n")
+        escribir_pagina(pagina, archivo)
+    return cantidad
+
+
+def exportar(_pedidos, destino, formato: str = 'jsonl', despues_de: str = None, limite: int = None,
+             **filtros) -> int:
+    """Escribe los pedidos de a uno, sin armar el resultado completo en memoria.
+
+    Args:
+        _pedidos: Pedidos a exportar.
+        destino: Ruta del archivo o un archivo ya abierto.
+        formato (str): jsonl, csv (la misma estructura que lee cargar_pedidos) o paginas.
+        despues_de (str): Cursor, el último número de pedido ya exportado.
+        limite (int): Cantidad máxima de pedidos.
+        **filtros: enviado, ciudad, desde y hasta, como en seleccionar().
+
+    Returns:
+        int: La cantidad de pedidos exportados.
+    """
+    escritores: dict = {'jsonl': escribir_jsonl, 'csv': escribir_csv, 'paginas': escribir_paginas}
+    if formato not in escritores:
+        raise ValueError(f"Formato '{formato}' desconocido, se esperaba {', '.join(FORMATOS)}.")
+    pedidos_recorridos = recorrer(_pedidos, seleccionar(_pedidos, despues_de=despues_de, **filtros), limite)
+    if isinstance(destino, (str, os.PathLike)):
+        with open(destino, 'w', newline='', encoding='utf-8') as archivo:
+            return escritores[formato](pedidos_recorridos, archivo)
+    return escritores[formato](pedidos_recorridos, destino)
+
+
+def exportar_pedidos():
+    from main import abrir_pedidos, CARPETA_DATOS
+
+    parser = argparse.ArgumentParser(description='Exporta los pedidos guardados.')
+    parser.add_argument('destino', nargs='?', default=None, help='archivo de salida, la pantalla si falta')
+    parser.add_argument('--formato', choices=FORMATOS, default='jsonl')
+    parser.add_argument('--datos', default=CARPETA_DATOS, help='carpeta de los datos guardados')
+    parser.add_argument('--enviado', choices=['si', 'no'], default=None)
+    parser.add_argument('--ciudad', default=None)
+    parser.add_argument('--desde', default=None, help='fecha dd/mm/yyyy')
+    parser.add_argument('--hasta', default=None, help='fecha dd/mm/yyyy')
+    parser.add_argument('--despues-de', default=None, help='cursor: último número de pedido ya exportado')
+    parser.add_argument('--limite', type=int, default=None)
+    args = parser.parse_args()
+
+    pedidos, diario = abrir_pedidos(args.datos)
+    diario.cerrar()
+    enviado = None if args.enviado is None else args.enviado == 'si'
+    cantidad = exportar(pedidos, args.destino or sys.stdout, args.formato, args.despues_de, args.limite,
+                        enviado=enviado, ciudad=args.ciudad, desde=args.desde, hasta=args.hasta)
+    print(f"\n\t\t{cantidad} pedidos exportados.", file=sys.stderr)
+
+
+if __name__ == '__main__':
+    exportar_pedidos()
@@ -0,0 +1,86 @@
+import argparse
+import csv
+import random
+from datetime import date, timedelta
+from exportar import ENCABEZADO_CSV
+from validaciones import CODIGO_BOTELLA, CODIGO_VASO, COLORES_BOTELLA, COLORES_VASO
+
+# Ciudades de destino con su provincia, de la más a la menos pedida
+CIUDADES: list[tuple] = [
+    ("CABA", "Buenos Aires"), ("Córdoba", "Córdoba"), ("Rosario", "Santa Fe"), ("La Plata", "Buenos Aires"),
+    ("Mendoza", "Mendoza"), ("Mar del Plata", "Buenos Aires"), ("San Miguel de Tucumán", "Tucumán"),
+    ("Salta", "Salta"), ("Santa Fe", "Santa Fe"), ("Villa María", "Córdoba"), ("Neuquén", "Neuquén"),
+    ("Bahía Blanca", "Buenos Aires"), ("Río Cuarto", "Córdoba"), ("Paraná", "Entre Ríos"), ("Posadas", "Misiones"),
+    ("San Juan", "San Juan"), ("Resistencia", "Chaco"), ("Corrientes", "Corrientes"), ("Ushuaia", "Tierra del Fuego"),
+    ("San Carlos de Bariloche", "Río Negro")
+]
+# Exponente de la distribución de pedidos por ciudad: la ciudad n recibe pedidos en proporción a 1 / n ** SESGO
+SESGO: float = 1.2
+NOMBRES: list[str] = ["Juan", "María", "Lucía", "Mario", "Sofía", "Carlos", "Ana", "Diego", "Laura", "Pedro"]
+APELLIDOS: list[str] = ["Alvarez", "Gómez", "Fernández", "Mangiafave", "Pérez", "Rodríguez", "López", "Díaz", "Romero",
+                        "Sosa"]
+DESCUENTOS: list[int] = [0, 0, 0, 5, 5, 10, 15, 20]
+FECHA_INICIAL: date = date(2018, 1, 1)
+DIAS: int = 5 * 365
+
+
+def generar_filas(lineas: int, semilla: int = 0, clientes: int = 5000):
+    """Genera filas de pedidos realistas, con las líneas de cada pedido seguidas.
+
+    Args:
+        lineas (int): Cantidad de filas.
+        semilla (int): Semilla del generador, la misma semilla da el mismo archivo.
+        clientes (int): Cantidad de clientes distintos.
+
+    Returns:
+        Generador de las filas, con las columnas del .csv original.
+    """
+    generador: random.Random = random.Random(semilla)
+    pesos: list[float] = [1 / (posicion + 1) ** SESGO for posicion in range(len(CIUDADES))]
+    # Cada cliente compra siempre desde la misma ciudad
+    nombres_clientes: list[str] = [f"{generador.choice(NOMBRES)} {generador.choice(APELLIDOS)} {numero}"
+                                   for numero in range(clientes)]
+    ciudades_clientes: list[tuple] = generador.choices(CIUDADES, pesos, k=clientes)
+    colores: dict = {CODIGO_BOTELLA: COLORES_BOTELLA, CODIGO_VASO: COLORES_VASO}
+    nro_pedido: int = 0
+    generadas: int = 0
+    while generadas < lineas:
+        nro_pedido += 1
+        cliente: int = generador.randrange(clientes)
+        ciudad, provincia = ciudades_clientes[cliente]
+        # Los números de pedido avanzan con la fecha
+        fecha: date = FECHA_INICIAL + timedelta(days=DIAS * generadas // lineas)
+        descuento: int = generador.choice(DESCUENTOS)
+        articulos: list[tuple] = [(codigo, color) for codigo in colores for color in colores[codigo]]
+        for codigo, color in generador.sample(articulos, min(generador.randint(1, 4), lineas - generadas)):
+            yield [nro_pedido, fecha.strftime("%d/%m/%Y"), nombres_clientes[cliente], ciudad, provincia, codigo,
+                   color, generador.randint(1, 60) * 6, descuento]
+            generadas += 1
+
+
+def generar_csv(destino: str, lineas: int, semilla: int = 0) -> None:
+    """Escribe un archivo .csv de pedidos con el encabezado original, de a una fila.
+
+    Args:
+        destino (str): Archivo a escribir.
+        lineas (int): Cantidad de filas, sin contar el encabezado.
+        semilla (int): Semilla del generador.
+    """
+    with open(destino, 'w', newline='', encoding='utf-8') as archivo_csv:
+        escritor = csv.writer(archivo_csv, delimiter=',', lineterminator='\n')
+        escritor.writerow(ENCABEZADO_CSV)
+        escritor.writerows(generar_filas(lineas, semilla))
+
+
+def generar():
+    parser = argparse.ArgumentParser(description='Genera un archivo .csv de pedidos sintéticos.')
+    parser.add_argument('destino')
+    parser.add_argument('--lineas', type=int, default=1000000)
+    parser.add_argument('--semilla', type=int, default=0)
+    args = parser.parse_args()
+    generar_csv(args.destino, args.lineas, args.semilla)
+    print(f"\n\t\t{args.lineas} líneas escritas en {args.destino}")
+
+
+if __name__ == '__main__':
+    generar()
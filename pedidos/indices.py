@@ -0,0 +1,267 @@
+from bisect import bisect_left, bisect_right, insort
+from datetime import date, datetime
+from heapq import merge
+
+# Campos de texto indexados. Se comparan sin distinguir mayúsculas ni espacios en los extremos.
+CAMPOS_TEXTO: tuple = ("ciudad", "provincia", "cliente")
+FORMATO_FECHA: str = "%d/%m/%Y"
+
+# Lista vacía compartida por los valores sin pedidos, no se modifica
+VACIO: list = []
+
+
+def normalizar(valor: str) -> str:
+    return valor.strip().upper()
+
+
+def obtener_clave(nro_pedido: str) -> str:
+    """Devuelve la clave con la que se ordenan los números de pedido en los índices.
+
+    Un carácter con el largo del número seguido del número ordena igual que ordenar(): primero por largo y
+    después como texto, que para números sin ceros a la izquierda es el orden numérico.
+    """
+    return chr(len(nro_pedido)) + nro_pedido
+
+
+def ordenar(nros_pedido) -> list[str]:
+    """Ordena números de pedido como números cuando son dígitos, que es el orden en que se cargan.
+
+    Args:
+        nros_pedido: Números de pedido en cualquier orden.
+
+    Returns:
+        list[str]: Los números de pedido ordenados.
+    """
+    return sorted(nros_pedido, key=obtener_clave)
+
+
+def recorrer_claves(claves: list[str], despues_de: str = None):
+    """Recorre una lista ordenada de claves a partir de un cursor, sin copiarla.
+
+    Args:
+        claves (list[str]): Claves ordenadas, como las de los índices.
+        despues_de (str): Cursor, el último número de pedido ya recorrido. None para empezar desde el principio.
+
+    Returns:
+        Generador de los números de pedido posteriores al cursor.
+    """
+    posicion: int = 0 if despues_de is None else bisect_right(claves, obtener_clave(despues_de))
+    while posicion < len(claves):
+        yield claves[posicion][1:]
+        posicion += 1
+
+
+class Indices:
+    """Índices secundarios de los pedidos: ciudad, provincia, cliente, estado de envío y fecha.
+
+    Cada índice relaciona un valor con la lista ordenada de las claves de los pedidos que lo tienen (ver
+    obtener_clave), así un listado puede retomarse desde un cursor sin ordenar nada. El almacén avisa con alta()
+    cada pedido nuevo o modificado y con baja() cada pedido eliminado o antes de modificarlo.
+
+    Si el almacén parte de una base, las listas solo tienen los pedidos en memoria y las consultas los combinan
+    con los índices guardados en la base, salteando los pedidos de la base que están ocultos.
+    """
+
+    def __init__(self, base=None, ocultos: set = None):
+        self.base = base
+        self.ocultos: set = set() if ocultos is None else ocultos
+        # Durante una carga las claves se juntan en conjuntos y se ordenan una sola vez al terminarla
+        self.cargando: bool = False
+        self.vaciar()
+
+    def vaciar(self) -> None:
+        self.por_campo: dict = {campo: {} for campo in CAMPOS_TEXTO}
+        self.por_campo["enviado"] = {}
+        self.por_fecha: dict = {}
+        # Fechas distintas que tienen pedidos, ordenadas para consultar rangos
+        self.fechas: list[date] = []
+        # Conversión de cada texto de fecha ya visto, las fechas se repiten mucho entre pedidos
+        self.fechas_convertidas: dict = {}
+        # Claves de todos los pedidos, para listarlos sin filtros
+        self.claves: list[str] = []
+
+    def cambiar_base(self, base, registros: dict) -> None:
+        """Pasa a combinar las consultas con otra base y vuelve a armar las listas con los pedidos en memoria."""
+        self.base = base
+        fechas_convertidas: dict = self.fechas_convertidas
+        self.vaciar()
+        self.fechas_convertidas = fechas_convertidas
+        self.empezar_carga()
+        for nro_pedido, pedido in registros.items():
+            self.alta(nro_pedido, pedido)
+        self.terminar_carga()
+
+    def listas(self) -> list[dict]:
+        return [*self.por_campo.values(), self.por_fecha]
+
+    def empezar_carga(self) -> None:
+        """Pasa a juntar las claves sin ordenarlas, para dar de alta muchos pedidos de una vez. Insertar cada clave
+        en su lugar cuesta mover la mitad de la lista si los números no llegan en orden.
+
+        Hasta terminar_carga() no se pueden hacer consultas.
+        """
+        self.cargando = True
+        self.claves = set(self.claves)
+        for indice in self.listas():
+            for valor, claves in indice.items():
+                indice[valor] = set(claves)
+
+    def terminar_carga(self) -> None:
+        """Ordena las claves juntadas desde empezar_carga() y vuelve a insertar cada alta en su lugar."""
+        self.cargando = False
+        self.claves = sorted(self.claves)
+        for indice in self.listas():
+            for valor, claves in indice.items():
+                indice[valor] = sorted(claves)
+        self.fechas = sorted(self.por_fecha)
+
+    def filtrar_ocultos(self, nros_pedido):
+        for nro_pedido in nros_pedido:
+            if nro_pedido not in self.ocultos:
+                yield nro_pedido
+
+    def convertir_fecha(self, fecha: str):
+        if fecha not in self.fechas_convertidas:
+            try:
+                self.fechas_convertidas[fecha] = datetime.strptime(fecha, FORMATO_FECHA).date()
+            except ValueError:
+                self.fechas_convertidas[fecha] = None
+        return self.fechas_convertidas[fecha]
+
+    def alta(self, nro_pedido: str, pedido) -> None:
+        clave: str = obtener_clave(nro_pedido)
+        if self.cargando:
+            agregar, vacia = set.add, set
+        else:
+            agregar, vacia = insort, list
+        agregar(self.claves, clave)
+        for campo in CAMPOS_TEXTO:
+            agregar(self.por_campo[campo].setdefault(normalizar(pedido[campo]), vacia()), clave)
+        agregar(self.por_campo["enviado"].setdefault(bool(pedido["enviado"]), vacia()), clave)
+        fecha = self.convertir_fecha(pedido["fecha"])
+        if fecha is not None:
+            if fecha not in self.por_fecha:
+                self.por_fecha[fecha] = vacia()
+                if not self.cargando:
+                    insort(self.fechas, fecha)
+            agregar(self.por_fecha[fecha], clave)
+
+    def baja(self, nro_pedido: str, pedido) -> None:
+        clave: str = obtener_clave(nro_pedido)
+        quitar_clave(self.claves, clave)
+        for campo in CAMPOS_TEXTO:
+            quitar(self.por_campo[campo], normalizar(pedido[campo]), clave)
+        quitar(self.por_campo["enviado"], bool(pedido["enviado"]), clave)
+        fecha = self.convertir_fecha(pedido["fecha"])
+        if fecha is not None and quitar(self.por_fecha, fecha, clave) and not self.cargando:
+            del self.fechas[bisect_left(self.fechas, fecha)]
+
+    def obtener_claves(self, campo: str, valor) -> list[str]:
+        if campo == "fecha":
+            return self.por_fecha.get(self.convertir_fecha(valor) if isinstance(valor, str) else valor, VACIO)
+        if campo == "enviado":
+            return self.por_campo[campo].get(bool(valor), VACIO)
+        return self.por_campo[campo].get(normalizar(valor), VACIO)
+
+    def obtener(self, campo: str, valor) -> list[str]:
+        """Devuelve, ordenados, los números de pedido que tienen determinado valor en un campo.
+
+        Args:
+            campo (str): ciudad, provincia, cliente, enviado o fecha.
+            valor: Valor buscado. Las fechas pueden ser date o texto dd/mm/yyyy.
+
+        Returns:
+            list[str]: Los números de pedido encontrados.
+        """
+        return list(self.recorrer(campo, valor))
+
+    def contar(self, campo: str, valor) -> int:
+        """Devuelve cuántos pedidos tienen un valor en un campo. Con una base puede contar de más los pedidos
+        ocultos, alcanza para elegir el índice más chico."""
+        cantidad: int = len(self.obtener_claves(campo, valor))
+        if self.base is not None:
+            if campo == "fecha" and isinstance(valor, str):
+                valor = self.convertir_fecha(valor)
+            if valor is not None:
+                cantidad += self.base.contar(campo, valor)
+        return cantidad
+
+    def recorrer(self, campo: str = None, valor=None, despues_de: str = None):
+        """Recorre en orden, a partir de un cursor, los números de pedido con determinado valor en un campo.
+
+        Args:
+            campo (str): ciudad, provincia, cliente, enviado o fecha. None para recorrer todos los pedidos.
+            valor: Valor buscado.
+            despues_de (str): Cursor, el último número de pedido ya recorrido.
+
+        Returns:
+            Generador de números de pedido.
+        """
+        propios = recorrer_claves(self.claves if campo is None else self.obtener_claves(campo, valor), despues_de)
+        if self.base is None:
+            return propios
+        if campo == "fecha" and isinstance(valor, str):
+            valor = self.convertir_fecha(valor)
+        if campo is not None and valor is None:
+            return propios
+        return merge(self.filtrar_ocultos(self.base.recorrer(campo, valor, despues_de)), propios, key=obtener_clave)
+
+    def obtener_fechas(self, desde: date, hasta: date) -> list[date]:
+        return self.fechas[bisect_left(self.fechas, desde):bisect_right(self.fechas, hasta)]
+
+    def contar_fechas(self, desde: date, hasta: date) -> int:
+        cantidad: int = sum(len(self.por_fecha[fecha]) for fecha in self.obtener_fechas(desde, hasta))
+        if self.base is not None:
+            cantidad += self.base.contar_fechas(desde, hasta)
+        return cantidad
+
+    def recorrer_fechas(self, desde: date, hasta: date, despues_de: str = None):
+        """Recorre en orden, a partir de un cursor, los números de pedido con fecha entre desde y hasta (inclusive).
+
+        Args:
+            desde (date): Fecha inicial.
+            hasta (date): Fecha final.
+            despues_de (str): Cursor, el último número de pedido ya recorrido.
+
+        Returns:
+            Generador de números de pedido.
+        """
+        recorridos: list = [recorrer_claves(self.por_fecha[fecha], despues_de)
+                            for fecha in self.obtener_fechas(desde, hasta)]
+        if self.base is not None:
+            recorridos.append(self.filtrar_ocultos(self.base.recorrer_fechas(desde, hasta, despues_de)))
+        return merge(*recorridos, key=obtener_clave)
+
+
+def quitar_clave(claves: list[str], clave: str) -> bool:
+    """Quita una clave de una lista ordenada, o del conjunto que la reemplaza durante una carga.
+
+    Returns:
+        bool: Si la clave estaba en la lista.
+    """
+    if isinstance(claves, set):
+        if clave not in claves:
+            return False
+        claves.remove(clave)
+        return True
+    posicion: int = bisect_left(claves, clave)
+    if posicion < len(claves) and claves[posicion] == clave:
+        del claves[posicion]
+        return True
+    return False
+
+
+def quitar(indice: dict, valor, clave: str) -> bool:
+    """Quita un pedido de un índice y borra el valor si ya no le quedan pedidos.
+
+    Returns:
+        bool: Si el valor quedó sin pedidos.
+    """
+    claves: list[str] = indice.get(valor)
+    if claves is None:
+        return False
+    quitar_clave(claves, clave)
+    if len(claves) == 0:
+        del indice[valor]
+        return True
+    return False
@@ -0,0 +1,227 @@
+import argparse
+import json
+import sys
+import time
+from validaciones import validar_cantidad, validar_color, validar_descuento, validar_fecha, validar_productos
+
+# Operaciones que acepta un lote, una por línea JSON:
+#   {"op": "crear", "nro": "17", "pedido": {"fecha": ..., "cliente": ..., "ciudad": ..., "provincia": ...,
+#       "productos": {código: {color: {"cantidad": n}}}, "descuento": ..., "enviado": false}}   ("nro" es opcional)
+#   {"op": "modificar", "nro": "17", "cambios": {campo: valor, ...}}
+#   {"op": "poner_cantidad", "nro": "17", "codigo": "1334", "color": "azul", "cantidad": 5}
+#   {"op": "eliminar", "nro": "17"}
+#   {"op": "enviar", "nro": "17"}
+OPERACIONES: list = ['crear', 'modificar', 'poner_cantidad', 'eliminar', 'enviar']
+CAMPOS_TEXTO: tuple = ("cliente", "ciudad", "provincia")
+
+
+def validar_texto(campo: str, valor) -> str:
+    if not isinstance(valor, str) or valor.strip() == '':
+        raise ValueError(f"El campo {campo} no puede estar vacío.")
+    return valor
+
+
+def validar_campo(campo: str, valor):
+    """Verifica el nuevo valor de un campo con las mismas reglas que el menú.
+
+    Raises:
+        ValueError: Si el campo no existe o el valor no es válido.
+    """
+    if campo == "fecha":
+        return validar_fecha(valor)
+    if campo in CAMPOS_TEXTO:
+        return validar_texto(campo, valor)
+    if campo == "productos":
+        return validar_productos(valor)
+    if campo == "descuento":
+        return validar_descuento(valor)
+    if campo == "enviado":
+        if not isinstance(valor, bool):
+            raise ValueError(f"El campo enviado debe ser true o false, no {valor!r}.")
+        return valor
+    raise ValueError(f"El campo {campo!r} no existe.")
+
+
+def obtener_pedido(_pedidos, nro_pedido: str):
+    if nro_pedido not in _pedidos:
+        raise ValueError(f"No existe ningún pedido con el número {nro_pedido!r}.")
+    return _pedidos[nro_pedido]
+
+
+def obtener_proximo_nro(_pedidos) -> str:
+    """Devuelve el número siguiente al mayor número de pedido cargado."""
+    return str(max((int(nro) for nro in _pedidos if nro.isdigit()), default=0) + 1)
+
+
+def crear(_pedidos, datos: dict, nro_pedido: str = None) -> str:
+    """Da de alta un pedido.
+
+    Args:
+        _pedidos (Pedidos): Pedidos cargados.
+        datos (dict): Campos del pedido. "enviado" es opcional.
+        nro_pedido (str): Número del pedido nuevo, el siguiente al mayor si falta.
+
+    Returns:
+        str: El número del pedido creado.
+
+    Raises:
+        ValueError: Si falta algún campo, algún valor no es válido o el número ya existe.
+    """
+    if not isinstance(datos, dict):
+        raise ValueError("Faltan los datos del pedido.")
+    faltantes: list = [campo for campo in ("fecha", "cliente", "ciudad", "provincia", "productos", "descuento")
+                       if campo not in datos]
+    if len(faltantes) > 0:
+        raise ValueError(f"Faltan los campos {', '.join(faltantes)}.")
+    pedido: dict = {campo: validar_campo(campo, valor) for campo, valor in datos.items()}
+    pedido.setdefault("enviado", False)
+    nro_pedido = obtener_proximo_nro(_pedidos) if nro_pedido is None else str(nro_pedido)
+    if nro_pedido in _pedidos:
+        raise ValueError(f"Ya existe un pedido con el número {nro_pedido!r}.")
+    _pedidos[nro_pedido] = pedido
+    return nro_pedido
+
+
+def modificar(_pedidos, nro_pedido: str, cambios: dict) -> None:
+    """Modifica varios campos de un pedido de una sola vez. Si algún valor no es válido no se cambia nada.
+
+    Raises:
+        ValueError: Si el pedido no existe o algún campo o valor no es válido.
+    """
+    pedido = obtener_pedido(_pedidos, nro_pedido)
+    if not isinstance(cambios, dict) or len(cambios) == 0:
+        raise ValueError("No se indicó ningún cambio.")
+    validados: dict = {campo: validar_campo(campo, valor) for campo, valor in cambios.items()}
+    if len(validados) == 1:
+        campo, valor = next(iter(validados.items()))
+        pedido[campo] = valor
+    else:
+        # Se reemplaza el pedido completo para avisar un único cambio a los índices, totales y diario
+        _pedidos[nro_pedido] = {**pedido.a_dict(), **validados}
+
+
+def poner_cantidad(_pedidos, nro_pedido: str, codigo: str, color: str, cantidad) -> None:
+    """Agrega un artículo y color a un pedido, o reemplaza su cantidad si ya estaba.
+
+    Raises:
+        ValueError: Si el pedido no existe o el código, color o cantidad no son válidos.
+    """
+    pedido = obtener_pedido(_pedidos, nro_pedido)
+    pedido.poner_cantidad(str(codigo), validar_color(str(codigo), color), validar_cantidad(cantidad))
+
+
+def eliminar(_pedidos, nro_pedido: str) -> None:
+    obtener_pedido(_pedidos, nro_pedido)
+    del _pedidos[nro_pedido]
+
+
+def enviar(_pedidos, nro_pedido: str) -> None:
+    """Marca un pedido como enviado.
+
+    Raises:
+        ValueError: Si el pedido no existe o ya fue enviado.
+    """
+    pedido = obtener_pedido(_pedidos, nro_pedido)
+    if pedido["enviado"]:
+        raise ValueError(f"El pedido {nro_pedido} ya fue enviado.")
+    pedido["enviado"] = True
+
+
+def aplicar(_pedidos, operacion: dict) -> str:
+    """Aplica una operación de un lote.
+
+    Returns:
+        str: El número del pedido afectado.
+
+    Raises:
+        ValueError: Si la operación no es válida. En ese caso los pedidos no cambian.
+    """
+    if not isinstance(operacion, dict) or operacion.get("op") not in OPERACIONES:
+        raise ValueError(f"Operación desconocida, se esperaba {', '.join(OPERACIONES)}.")
+    op: str = operacion["op"]
+    nro_pedido = operacion.get("nro")
+    if nro_pedido is not None:
+        nro_pedido = str(nro_pedido)
+    elif op != "crear":
+        raise ValueError("Falta el número de pedido.")
+    if op == "crear":
+        return crear(_pedidos, operacion.get("pedido"), nro_pedido)
+    if op == "modificar":
+        modificar(_pedidos, nro_pedido, operacion.get("cambios"))
+    elif op == "poner_cantidad":
+        poner_cantidad(_pedidos, nro_pedido, operacion.get("codigo"), operacion.get("color"),
+                       operacion.get("cantidad"))
+    elif op == "eliminar":
+        eliminar(_pedidos, nro_pedido)
+    else:
+        enviar(_pedidos, nro_pedido)
+    return nro_pedido
+
+
+def aplicar_lote(_pedidos, operaciones) -> dict:
+    """Aplica una serie de operaciones. Las operaciones inválidas se informan y no detienen el resto.
+
+    Args:
+        _pedidos (Pedidos): Pedidos cargados.
+        operaciones: Operaciones a aplicar. Cada una es un diccionario, o un texto JSON como las líneas de un archivo.
+
+    Returns:
+        dict: {"aplicadas": n, "errores": [{"linea": i, "error": mensaje}, ...], "segundos": s}
+    """
+    resultado: dict = {"aplicadas": 0, "errores": []}
+    inicio: float = time.perf_counter()
+    # Número para los pedidos nuevos sin número, se calcula una sola vez por lote
+    proximo_nro: int = None
+    for nro_linea, operacion in enumerate(operaciones, 1):
+        try:
+            if isinstance(operacion, str):
+                if operacion.strip() == '':
+                    continue
+                operacion = json.loads(operacion)
+            if isinstance(operacion, dict) and operacion.get("op") == "crear" and operacion.get("nro") is None:
+                if proximo_nro is None:
+                    proximo_nro = int(obtener_proximo_nro(_pedidos))
+                while str(proximo_nro) in _pedidos:
+                    proximo_nro += 1
+                operacion = {**operacion, "nro": str(proximo_nro)}
+            aplicar(_pedidos, operacion)
+            resultado["aplicadas"] += 1
+        except (TypeError, ValueError) as error:
+            resultado["errores"].append({"linea": nro_linea, "error": str(error)})
+    resultado["segundos"] = time.perf_counter() - inicio
+    return resultado
+
+
+def aplicar_archivo():
+    from main import abrir_pedidos, CARPETA_DATOS
+
+    parser = argparse.ArgumentParser(description='Aplica un archivo de operaciones sobre los pedidos guardados.')
+    parser.add_argument('archivo', help='operaciones en formato JSON Lines')
+    parser.add_argument('--datos', default=CARPETA_DATOS, help='carpeta de los datos guardados')
+    parser.add_argument('--errores', default=None, help='archivo donde guardar los errores en formato JSON Lines')
+    args = parser.parse_args()
+
+    pedidos, diario = abrir_pedidos(args.datos)
+    try:
+        with open(args.archivo, encoding='utf-8') as archivo:
+            resultado = aplicar_lote(pedidos, archivo)
+    finally:
+        diario.cerrar()
+
+    segundos: float = resultado["segundos"]
+    total: int = resultado["aplicadas"] + len(resultado["errores"])
+    print(f"\n\t\t{resultado['aplicadas']} operaciones aplicadas, {len(resultado['errores'])} con errores, "
+          f"{total / segundos if segundos > 0 else 0.0:.0f} operaciones/s.")
+    if args.errores is not None:
+        with open(args.errores, 'w', encoding='utf-8') as archivo:
+            for error in resultado["errores"]:
+                archivo.write(json.dumps(error, ensure_ascii=False) + '\n')
+    else:
+        for error in resultado["errores"]:
+            print(f"\t\tLínea {error['linea']}: {error['error']}")
+    if len(resultado["errores"]) > 0:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    aplicar_archivo()
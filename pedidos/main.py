@@ -1,6 +1,12 @@
-import json
 import csv
-from datetime import datetime
+import os
+import sys
+from agregados import Agregados, recalcular, comparar
+from almacen import Pedido, Pedidos
+from exportar import obtener_pagina, escribir_pagina
+from lotes import obtener_proximo_nro
+from diario import Diario, CARPETA_DATOS, leer_snapshot, reproducir
+from validaciones import CANTIDAD_MAXIMA, COLORES_BOTELLA, COLORES_VASO, validar_cantidad, validar_fecha
 
 # Precio en dólares
 PRECIO_BOTELLA = 15
@@ -8,55 +14,143 @@ PRECIO_VASO = 8
 # Peso en gramos
 PESO_BOTELLA = 450
 PESO_VASO = 350
+# Archivo del que se leen los pedidos por defecto
+RUTA_PEDIDOS = 'csv/pedidos.csv'
 
 
-def cargar_pedidos() -> dict:
-    """Lee un archivo con extensión .csv para cargar los pedidos en un diccionario en memoria
+def cargar_pedidos(origen=RUTA_PEDIDOS, informar_cada: int = 0) -> Pedidos:
+    """Lee un archivo con extensión .csv para cargar los pedidos en un diccionario en memoria.
+    Las filas se procesan de a una, sin cargar el archivo completo.
+
+    Args:
+        origen: Ruta del archivo .csv o un archivo ya abierto.
+        informar_cada (int): Cada cuántas líneas se informa el avance de la lectura. 0 para no informar.
 
     Returns:
-        dict: Un diccionario representando la estructura de los pedidos
+        Pedidos: Los pedidos leídos, accesibles con la misma estructura de diccionario
     """
-    with open('csv/pedidos.csv', newline='', encoding='utf-8') as archivo_csv:
-        lector = csv.reader(archivo_csv, delimiter=',')
-        lista_pedidos = list(lector)
-
-    pedidos_archivo: dict = {}
-    for indice in range(1, len(lista_pedidos)):
-        registro_actual: list = lista_pedidos[indice]
-        nro_pedido: str = registro_actual[0]
-        if nro_pedido not in pedidos_archivo.keys():
-            pedidos_archivo[nro_pedido]: dict = {
-                "fecha": registro_actual[1],
-                "cliente": registro_actual[2],
-                "ciudad": str(registro_actual[3]),
-                "provincia": str(registro_actual[4]),
-                "productos": {
-                    registro_actual[5]: {
-                        str(registro_actual[6]).lower(): {
-                            "cantidad": int(registro_actual[7])
-                        }
-                    }
-                },
-                "descuento": float(registro_actual[8]),
-                "enviado": False
-            }
-        else:
-            productos: dict = pedidos_archivo[str(nro_pedido)]["productos"]
-            codigo: str = registro_actual[5]
-            if codigo in productos.keys():
-                items: dict = productos[codigo]
-                items[str(registro_actual[6]).lower()] = {
-                    "cantidad": int(registro_actual[7])
-                }
-            else:
-                productos[codigo] = {
-                    str(registro_actual[6]).lower(): {
-                        "cantidad": int(registro_actual[7])
-                    }
-                }
+    if isinstance(origen, (str, os.PathLike)):
+        with open(origen, newline='', encoding='utf-8') as archivo_csv:
+            return leer_pedidos(archivo_csv, informar_cada)
+    return leer_pedidos(origen, informar_cada)
+
+
+def leer_pedidos(archivo_csv, informar_cada: int = 0) -> Pedidos:
+    """Recorre las filas de un archivo .csv abierto y agrupa las líneas de cada pedido.
+
+    Args:
+        archivo_csv: Archivo abierto, o cualquier iterable de líneas, con el encabezado en la primera línea.
+        informar_cada (int): Cada cuántas líneas se informa el avance de la lectura. 0 para no informar.
+
+    Returns:
+        Pedidos: Los pedidos leídos, accesibles con la misma estructura de diccionario
+    """
+    lector = csv.reader(archivo_csv, delimiter=',')
+    next(lector, None)
+    pedidos_archivo: Pedidos = crear_almacen()
+    # Los índices se ordenan una sola vez al final, los números de pedido pueden no venir en orden
+    pedidos_archivo.indices.empezar_carga()
+    nro_linea: int = 0
+    # Pedido cuyas filas seguidas se están leyendo, se guarda en el almacén de una vez al terminar sus filas
+    pendiente: Pedido = None
+    for nro_linea, registro_actual in enumerate(lector, 1):
+        if len(registro_actual) > 0:
+            pendiente = agregar_registro(pedidos_archivo, registro_actual, pendiente)
+        if informar_cada > 0 and nro_linea % informar_cada == 0:
+            print(f"\n\t\t{nro_linea} líneas leídas...")
+    if pendiente is not None:
+        pedidos_archivo[pendiente.nro] = pendiente
+    pedidos_archivo.indices.terminar_carga()
+    if informar_cada > 0:
+        print(f"\n\t\t{nro_linea} líneas leídas, {len(pedidos_archivo)} pedidos cargados.")
     return pedidos_archivo
 
 
+def obtener_precio(codigo: str) -> float:
+    """Devuelve el precio unitario de un artículo.
+
+    Args:
+        codigo (str): Código del artículo.
+
+    Returns:
+        float: El precio en usd.
+    """
+    return PRECIO_BOTELLA if codigo == "1334" else PRECIO_VASO
+
+
+def crear_almacen(base=None) -> Pedidos:
+    """Crea un almacén de pedidos que mantiene al día los totales de los pedidos enviados.
+
+    Args:
+        base (PedidosBinarios): Archivo binario del que se leen los pedidos, con sus índices y totales.
+            None para crear un almacén vacío.
+
+    Returns:
+        Pedidos: El almacén creado.
+    """
+    almacen: Pedidos = Pedidos(base=base)
+    almacen.agregados = Agregados(obtener_precio)
+    if base is not None:
+        almacen.agregados.cargar(base.obtener_totales())
+    almacen.agregar_observador(almacen.agregados, informar_cargados=base is None)
+    return almacen
+
+
+def abrir_pedidos(carpeta: str = CARPETA_DATOS, origen=RUTA_PEDIDOS) -> (Pedidos, Diario):
+    """Abre los pedidos guardados y el diario donde se registran sus cambios.
+    Los pedidos se leen de la última copia completa a medida que se acceden; solo se cargan en memoria los
+    cambios posteriores, que se reproducen del diario. Si todavía no hay datos guardados, se parte del archivo .csv.
+
+    Args:
+        carpeta (str): Carpeta de los datos guardados.
+        origen: Ruta del archivo .csv o un archivo ya abierto, usado solo la primera vez.
+
+    Returns:
+        (Pedidos, Diario): Los pedidos cargados y su diario, que hay que cerrar al terminar.
+    """
+    base = leer_snapshot(carpeta)
+    if base is None:
+        _pedidos: Pedidos = cargar_pedidos(origen)
+        sec: int = 0
+    else:
+        _pedidos: Pedidos = crear_almacen(base)
+        sec: int = reproducir(_pedidos, base.sec, carpeta)
+    diario: Diario = Diario(_pedidos, sec, carpeta)
+    if base is None:
+        diario.guardar_snapshot()
+    _pedidos.agregar_observador(diario, informar_cargados=False)
+    return _pedidos, diario
+
+
+def agregar_registro(pedidos_archivo: Pedidos, registro_actual: list, pendiente: Pedido = None) -> Pedido:
+    """Agrega una línea del archivo .csv al pedido que le corresponde, creándolo si todavía no existe.
+    Las líneas seguidas de un mismo pedido se juntan en un pedido pendiente, que se guarda en el almacén cuando
+    aparece otro número; así los índices y totales reciben un único aviso por pedido.
+
+    Args:
+        pedidos_archivo (Pedidos): Pedidos leídos hasta el momento.
+        registro_actual (list): Campos de la línea leída.
+        pendiente (Pedido): Pedido de las líneas anteriores que todavía no se guardó, o None.
+
+    Returns:
+        Pedido: El pedido pendiente después de esta línea, o None si la línea se agregó a un pedido ya guardado.
+    """
+    nro_pedido: str = registro_actual[0]
+    codigo, color, cantidad = registro_actual[5], str(registro_actual[6]).lower(), int(registro_actual[7])
+    if pendiente is not None:
+        if pendiente.nro == nro_pedido:
+            pendiente.agregar_linea(codigo, color, cantidad)
+            return pendiente
+        pedidos_archivo[pendiente.nro] = pendiente
+    if nro_pedido in pedidos_archivo:
+        pedidos_archivo[nro_pedido].poner_cantidad(codigo, color, cantidad)
+        return None
+    pendiente = Pedido(registro_actual[1], registro_actual[2], str(registro_actual[3]), str(registro_actual[4]),
+                       {codigo: {color: {"cantidad": cantidad}}}, float(registro_actual[8]))
+    pendiente.nro = nro_pedido
+    return pendiente
+
+
 def leer_opcion(opciones: list[str]) -> str:
     """Muestra las posibles opciones y lee la opción ingresada por el usuario.
 
@@ -84,11 +178,9 @@ def obtener_valor_positivo(campo: str) -> int:
     valor: int = 0
     while not valor > 0:
         try:
-            valor = int(input(f"\n\t[*] {campo}: "))
-            if valor <= 0:
-                raise ValueError
+            valor = validar_cantidad(input(f"\n\t[*] {campo}: "))
         except ValueError:
-            print("\n\tValor incorrecto. Debe ingresar un número entero positivo.")
+            print(f"\n\tValor incorrecto. Debe ingresar un número entero positivo, hasta {CANTIDAD_MAXIMA}.")
     return valor
 
 
@@ -135,8 +227,8 @@ def obtener_color_valido(opcion_articulo: str) -> str:
     Returns:
         str: El color elegido.
     """
-    colores_botella: list[str] = ["Verde", "Rojo", "Azul", "Negro", "Amarillo"]
-    colores_vaso: list[str] = ["Negro", "Azul"]
+    colores_botella: list[str] = COLORES_BOTELLA
+    colores_vaso: list[str] = COLORES_VASO
     opcion_color: str = ''
     color: str = ''
     if opcion_articulo == "1":
@@ -191,9 +283,8 @@ def obtener_fecha_valida() -> str:
     fecha: str = ''
     while not fecha_valida:
         fecha = input("\n\t[*] Fecha: ")
-        formato: str = "%d/%m/%Y"
         try:
-            fecha_valida = bool(datetime.strptime(fecha, formato))
+            fecha_valida = bool(validar_fecha(fecha))
         except ValueError:
             print("\n\t\tIngrese una fecha válida. Debe respetar el formato dd/mm/yyyy")
             fecha_valida = False
@@ -254,8 +345,9 @@ def crear_pedido(_pedidos: dict) -> None:
     productos: dict = cargar_productos()
     descuento: float = obtener_valor_en_rango("Descuento", 0, 100)
 
-    nro_pedido = len(_pedidos) + 1
-    _pedidos[str(nro_pedido)] = {
+    # El siguiente al mayor número: con pedidos eliminados, la cantidad de pedidos puede ser un número usado
+    nro_pedido: str = obtener_proximo_nro(_pedidos)
+    _pedidos[nro_pedido] = {
         "fecha": fecha,
         "cliente": cliente,
         "ciudad": ciudad,
@@ -379,8 +471,9 @@ def modificar_articulos(_pedidos: dict, nro_pedido: str) -> None:
     while accion != '4':
         accion = leer_opcion(["Agregar artículo", "Modificar artículo", "Eliminar articulo", "Salir"])
         print("\n\t\tArtículos actuales: ")
+        for codigo, color, cantidad in _pedidos[nro_pedido].recorrer_lineas():
+            print(f"\t\t\tcod-{codigo} {color}: {cantidad}")
         productos: dict = _pedidos[nro_pedido]['productos']
-        print(json.dumps(productos, indent=4, ensure_ascii=False))
         if accion == '1':
             agregar_nuevos_articulos(productos)
         elif accion == '2':
@@ -392,6 +485,9 @@ def modificar_articulos(_pedidos: dict, nro_pedido: str) -> None:
                 print(f"\n\t\tSe eliminó el artículo {codigo}.")
             else:
                 print("\n\t\tNo existe un artículo con ese código.")
+        # Los productos se arman al leerlos, los cambios se guardan de nuevo en el pedido solo si los hubo
+        if accion in ('1', '2', '3') and productos != _pedidos[nro_pedido]['productos']:
+            _pedidos[nro_pedido]['productos'] = productos
 
 
 def modificar_pedido(_pedidos: dict) -> None:
@@ -402,10 +498,7 @@ def modificar_pedido(_pedidos: dict) -> None:
     """
     if len(_pedidos) > 0:
         print("\n\t\tPedidos actuales:", end=' ')
-        lista_nro_pedidos: list[str] = []
-        for key in _pedidos.keys():
-            if not _pedidos[key]["enviado"]:
-                lista_nro_pedidos.append(key)
+        lista_nro_pedidos: list[str] = _pedidos.indices.obtener("enviado", False)
         print(", ".join(f"[{nro}]" for nro in lista_nro_pedidos))
         nro_pedido = input("\n\tIngrese el número de pedido a modificar: ")
         if nro_pedido in _pedidos.keys():
@@ -438,10 +531,7 @@ def eliminar_pedido(_pedidos: dict) -> None:
         _pedidos (dict): Diccionario que contiene la estructura base de los pedidos.
     """
     print("\n\t\tPedidos actuales:", end=' ')
-    lista_nro_pedidos: list[str] = []
-    for key in _pedidos.keys():
-        if not _pedidos[key]["enviado"]:
-            lista_nro_pedidos.append(key)
+    lista_nro_pedidos: list[str] = _pedidos.indices.obtener("enviado", False)
     print(", ".join(f"[{nro}]" for nro in lista_nro_pedidos))
     nro_pedido = input("\n\t\tIngrese el número de órden a eliminar: ")
     if nro_pedido in _pedidos.keys():
@@ -451,13 +541,18 @@ def eliminar_pedido(_pedidos: dict) -> None:
 
 
 def listar_pedidos(_pedidos: dict) -> None:
-    """Permite listar los pedidos que se encuentran cargados actualmente.
+    """Permite listar, de a una página, los pedidos que se encuentran cargados actualmente.
 
     Args:
         _pedidos (dict): Diccionario que contiene la estructura base de los pedidos.
     """
     if len(_pedidos) > 0:
-        print(json.dumps(_pedidos, indent=4, ensure_ascii=False))
+        cursor: str = None
+        opcion: str = 'S'
+        while opcion == 'S':
+            pagina, cursor = obtener_pagina(_pedidos, cursor)
+            escribir_pagina(pagina, sys.stdout)
+            opcion = input("\n\tDesea ver la página siguiente? [S/N]  ").upper() if cursor is not None else 'N'
     else:
         print("\n\t\tNo existen pedidos cargados actualmente.")
 
@@ -508,6 +603,28 @@ def imprimir_total(articulos_enviados: dict, ciudad: str) -> None:
         print(f"\n\t\tNo se ha envíado ningún artículo a {ciudad}.")
 
 
+def obtener_articulos_enviados(_pedidos: Pedidos, ciudad: str) -> dict:
+    """Devuelve la cantidad y el costo de los artículos enviados a determinada ciudad.
+
+    Args:
+         _pedidos (Pedidos): Pedidos cargados, con sus totales acumulados.
+         ciudad (str): Ciudad dónde fueron enviados los artículos.
+
+    Returns:
+        dict: {código: {"cantidad": n, "descuento": d, "bruto": x, "neto": y}}
+    """
+    articulos_enviados: dict = {}
+    for codigo, item in _pedidos.agregados.obtener("ciudad", ciudad).items():
+        articulos_enviados[codigo] = {
+            "cantidad": item["cantidad"],
+            # Descuento efectivo de todos los pedidos enviados a la ciudad
+            "descuento": round(100 * (1 - item["neto"] / item["bruto"]), 2) if item["bruto"] > 0 else 0.0,
+            "bruto": item["bruto"],
+            "neto": item["neto"]
+        }
+    return articulos_enviados
+
+
 def obtener_valor_total_por_ciudad(_pedidos: dict, ciudad: str) -> None:
     """Permite conocer el valor total de los articulos enviados a determinada ciudad.
 
@@ -515,32 +632,32 @@ def obtener_valor_total_por_ciudad(_pedidos: dict, ciudad: str) -> None:
          _pedidos (dict): Diccionario que contiene la estructura base de los pedidos.
          ciudad (str): Ciudad dónde fueron enviados los artículos.
     """
-    articulos_enviados: dict = {}
-    for k1 in _pedidos.keys():
-        if _pedidos[k1]["enviado"] and (_pedidos[k1]["ciudad"].upper() == ciudad.upper()):
-            productos: dict = _pedidos[k1]["productos"]
-            descuento: float = _pedidos[k1]["descuento"]
-            for k2 in productos.keys():
-                colores: dict = productos[k2]
-                precio: float = PRECIO_BOTELLA if k2 == "1334" else PRECIO_VASO
-                for k3 in colores.keys():
-                    cantidad: int = colores[k3]["cantidad"]
-                    if k2 not in articulos_enviados.keys():
-                        articulos_enviados[k2] = {
-                            "cantidad": cantidad,
-                            "descuento": descuento,
-                            "bruto": float(precio * cantidad),
-                            "neto": (precio * cantidad) * (100 - descuento) / 100
-                        }
-                    else:
-                        item = articulos_enviados[k2]
-                        item["cantidad"] += cantidad
-                        item["bruto"] += float(precio * cantidad)
-                        item["neto"] += (precio * cantidad) * (100 - descuento) / 100
-
-    imprimir_total(articulos_enviados, ciudad)
+    imprimir_total(obtener_articulos_enviados(_pedidos, ciudad), ciudad)
+
+
+def verificar_agregados(_pedidos: Pedidos) -> bool:
+    """Compara los totales acumulados de los pedidos enviados con un recálculo completo.
+
+    Args:
+        _pedidos (Pedidos): Pedidos cargados, con sus totales acumulados.
+
+    Returns:
+        bool: Si los totales coinciden.
+    """
+    diferencias: list[str] = comparar(_pedidos.agregados, recalcular(_pedidos, obtener_precio))
+    if len(diferencias) > 0:
+        print(f"\n\t\tSe encontraron {len(diferencias)} diferencias en los totales:")
+        for diferencia in diferencias:
+            print(f"\t\t{diferencia}")
+    else:
+        print("\n\t\tLos totales coinciden con el recálculo.")
+    return len(diferencias) == 0
 
 
 # Prueba de ejecución
-pedidos = cargar_pedidos()
-pedidos_abm(pedidos)
+if __name__ == '__main__':
+    pedidos, diario_pedidos = abrir_pedidos()
+    try:
+        pedidos_abm(pedidos)
+    finally:
+        diario_pedidos.cerrar()
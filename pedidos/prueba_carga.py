@@ -0,0 +1,109 @@
+import argparse
+import asyncio
+import json
+import random
+import time
+from servicio import HOST, LIMITE_LINEA, PUERTO
+
+# Ciudades de los pedidos que crea la prueba
+CIUDADES: list[str] = ["Villa María", "Córdoba", "Rosario", "CABA", "Mendoza"]
+
+
+def armar_solicitud(generador: random.Random, nros_pedido: list[str], escrituras: float) -> dict:
+    if len(nros_pedido) == 0 or generador.random() < escrituras:
+        if len(nros_pedido) > 0 and generador.random() < 0.5:
+            return {"op": "poner_cantidad", "nro": generador.choice(nros_pedido), "codigo": "1334",
+                    "color": generador.choice(["azul", "verde", "rojo"]), "cantidad": generador.randint(1, 50)}
+        return {"op": "crear", "pedido": {
+            "fecha": f"{generador.randint(1, 28):02d}/{generador.randint(1, 12):02d}/2022",
+            "cliente": f"Cliente {generador.randint(1, 500)}",
+            "ciudad": generador.choice(CIUDADES),
+            "provincia": "Córdoba",
+            "productos": {"568": {"negro": {"cantidad": generador.randint(1, 20)}}},
+            "descuento": generador.choice([0, 5, 10])
+        }}
+    eleccion: float = generador.random()
+    if eleccion < 0.8:
+        return {"op": "leer", "nro": generador.choice(nros_pedido)}
+    if eleccion < 0.9:
+        return {"op": "totales", "ciudad": generador.choice(CIUDADES)}
+    return {"op": "listar", "ciudad": generador.choice(CIUDADES), "limite": 10}
+
+
+async def simular_cliente(host: str, puerto: int, solicitudes: int, escrituras: float, semilla: int,
+                          nros_pedido: list[str], latencias: list, errores: list) -> None:
+    generador: random.Random = random.Random(semilla)
+    lector, escritor = await asyncio.open_connection(host, puerto, limit=LIMITE_LINEA)
+    try:
+        for _ in range(solicitudes):
+            solicitud: dict = armar_solicitud(generador, nros_pedido, escrituras)
+            inicio: float = time.perf_counter()
+            escritor.write(json.dumps(solicitud, ensure_ascii=False).encode('utf-8') + b'\n')
+            await escritor.drain()
+            respuesta: dict = json.loads(await lector.readline())
+            latencias.append(time.perf_counter() - inicio)
+            if not respuesta["ok"]:
+                errores.append(respuesta["error"])
+            elif solicitud["op"] == "crear":
+                nros_pedido.append(respuesta["nro"])
+    finally:
+        escritor.close()
+
+
+def obtener_percentil(valores: list, percentil: float) -> float:
+    ordenados: list = sorted(valores)
+    return ordenados[min(len(ordenados) - 1, int(len(ordenados) * percentil / 100))]
+
+
+async def probar_carga(host: str = HOST, puerto: int = PUERTO, clientes: int = 20, solicitudes: int = 500,
+                       escrituras: float = 0.2, semilla: int = 0) -> dict:
+    """Simula varios terminales a la vez contra el servicio y mide solicitudes por segundo y latencias.
+
+    Args:
+        host (str): Dirección del servicio.
+        puerto (int): Puerto del servicio.
+        clientes (int): Cantidad de conexiones simultáneas.
+        solicitudes (int): Solicitudes de cada cliente, una tras otra.
+        escrituras (float): Proporción de solicitudes que modifican pedidos.
+        semilla (int): Semilla de las solicitudes generadas.
+
+    Returns:
+        dict: Solicitudes por segundo, latencias p50 y p99 en milisegundos y cantidad de errores.
+    """
+    lector, escritor = await asyncio.open_connection(host, puerto, limit=LIMITE_LINEA)
+    escritor.write(b'{"op": "listar", "limite": 1000}\n')
+    await escritor.drain()
+    nros_pedido: list[str] = [pedido["nro"] for pedido in json.loads(await lector.readline())["pedidos"]]
+    escritor.close()
+
+    latencias: list = []
+    errores: list = []
+    inicio: float = time.perf_counter()
+    await asyncio.gather(*(simular_cliente(host, puerto, solicitudes, escrituras, semilla + i, nros_pedido,
+                                           latencias, errores) for i in range(clientes)))
+    segundos: float = time.perf_counter() - inicio
+    resultado: dict = {
+        "solicitudes": len(latencias),
+        "solicitudes_por_segundo": len(latencias) / segundos if segundos > 0 else 0.0,
+        "p50_ms": obtener_percentil(latencias, 50) * 1000,
+        "p99_ms": obtener_percentil(latencias, 99) * 1000,
+        "errores": len(errores)
+    }
+    print(f"\n\t\t{resultado['solicitudes']} solicitudes, {resultado['solicitudes_por_segundo']:.0f} solicitudes/s, "
+          f"p50 {resultado['p50_ms']:.2f} ms, p99 {resultado['p99_ms']:.2f} ms, {resultado['errores']} errores")
+    return resultado
+
+
+def probar():
+    parser = argparse.ArgumentParser(description='Prueba de carga del servicio de pedidos.')
+    parser.add_argument('--puerto', type=int, default=PUERTO)
+    parser.add_argument('--clientes', type=int, default=20)
+    parser.add_argument('--solicitudes', type=int, default=500, help='solicitudes de cada cliente')
+    parser.add_argument('--escrituras', type=float, default=0.2, help='proporción de escrituras')
+    parser.add_argument('--semilla', type=int, default=0)
+    args = parser.parse_args()
+    asyncio.run(probar_carga(HOST, args.puerto, args.clientes, args.solicitudes, args.escrituras, args.semilla))
+
+
+if __name__ == '__main__':
+    probar()
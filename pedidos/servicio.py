@@ -0,0 +1,220 @@
+import argparse
+import asyncio
+import json
+import logging
+from exportar import TAMANIO_PAGINA, obtener_pagina
+from lotes import aplicar, obtener_proximo_nro
+from main import CARPETA_DATOS, abrir_pedidos, obtener_articulos_enviados
+
+# El servicio solo escucha en el equipo local
+HOST: str = '127.0.0.1'
+PUERTO: int = 8765
+# Segundos entre dos bajadas a disco del diario. Las escrituras se confirman al cliente después de la bajada.
+INTERVALO_CONFIRMACION: float = 0.005
+OPERACIONES_LECTURA: list = ['leer', 'listar', 'totales']
+# Límite de una línea de solicitud o de respuesta, en bytes
+LIMITE_LINEA: int = 2 ** 20
+# Segundos entre dos revisiones de si hace falta guardar una copia completa de los pedidos
+INTERVALO_SNAPSHOT: float = 1.0
+
+registro = logging.getLogger(__name__)
+
+# Protocolo: cada solicitud y cada respuesta es una línea JSON.
+#   {"op": "leer", "nro": "17"}
+#   {"op": "listar", "enviado": false, "ciudad": ..., "desde": "dd/mm/yyyy", "hasta": ..., "despues_de": ..., "limite": 10}
+#   {"op": "totales", "ciudad": "Rosario"}
+#   crear, modificar, poner_cantidad, eliminar y enviar, con los mismos campos que las operaciones de un lote
+# La respuesta es {"ok": true, ...} o {"ok": false, "error": mensaje}.
+
+
+class Servicio:
+    """Atiende a varios clientes a la vez sobre el mismo almacén de pedidos.
+
+    Las lecturas responden con el estado en memoria sin esperar ningún bloqueo: cada escritura se aplica de una
+    sola vez, sin ceder el control en el medio, así que nunca se lee un pedido a medio modificar. Cada escritura
+    toma el bloqueo de su pedido hasta que el diario la baja a disco; las escrituras sobre un mismo pedido se
+    confirman en orden y las de pedidos distintos esperan juntas la misma bajada.
+
+    Lo que espera al disco corre en otros hilos: la bajada del diario y la escritura de la copia completa de los
+    pedidos. El diario se sigue escribiendo en orden desde el bucle de eventos mientras tanto.
+    """
+
+    def __init__(self, pedidos, diario=None, intervalo_confirmacion: float = INTERVALO_CONFIRMACION):
+        self.pedidos = pedidos
+        self.diario = diario
+        self.intervalo_confirmacion: float = intervalo_confirmacion
+        self.bloqueos: dict = {}
+        self.esperando_bloqueo: dict = {}
+        # Los pedidos nuevos sin número se numeran de a uno
+        self.bloqueo_numeracion: asyncio.Lock = asyncio.Lock()
+        self.proximo_nro: int = int(obtener_proximo_nro(pedidos))
+        self.confirmaciones: list = []
+        self.tarea_confirmacion: asyncio.Task = None
+        self.tarea_snapshot: asyncio.Task = None
+        # Copia completa que se está escribiendo en otro hilo
+        self.snapshot_en_curso: asyncio.Task = None
+        if diario is not None:
+            diario.solo_escribir = True
+
+    def obtener_bloqueo(self, nro_pedido: str) -> asyncio.Lock:
+        if nro_pedido not in self.bloqueos:
+            self.bloqueos[nro_pedido] = asyncio.Lock()
+            self.esperando_bloqueo[nro_pedido] = 0
+        self.esperando_bloqueo[nro_pedido] += 1
+        return self.bloqueos[nro_pedido]
+
+    def liberar_bloqueo(self, nro_pedido: str) -> None:
+        # Los bloqueos se descartan cuando nadie los usa, para no guardar uno por cada pedido tocado
+        self.esperando_bloqueo[nro_pedido] -= 1
+        if self.esperando_bloqueo[nro_pedido] == 0:
+            del self.bloqueos[nro_pedido]
+            del self.esperando_bloqueo[nro_pedido]
+
+    async def confirmar(self) -> None:
+        """Espera a que el diario baje a disco las escrituras hechas hasta el momento."""
+        if self.diario is None:
+            return
+        confirmacion: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.confirmaciones.append(confirmacion)
+        await confirmacion
+
+    async def bajar_diario(self) -> None:
+        while True:
+            await asyncio.sleep(self.intervalo_confirmacion)
+            if len(self.confirmaciones) > 0:
+                confirmaciones, self.confirmaciones = self.confirmaciones, []
+                try:
+                    await asyncio.get_running_loop().run_in_executor(None, self.diario.sincronizar)
+                except OSError as error:
+                    for confirmacion in confirmaciones:
+                        confirmacion.set_exception(error)
+                else:
+                    for confirmacion in confirmaciones:
+                        confirmacion.set_result(None)
+
+    async def guardar_snapshot(self) -> None:
+        """Guarda una copia completa de los pedidos. Solo la congelación y el cambio de base corren en el bucle."""
+        copia, sec = self.diario.preparar_snapshot()
+        await asyncio.get_running_loop().run_in_executor(None, self.diario.escribir_snapshot, copia, sec)
+        self.diario.terminar_snapshot()
+
+    async def guardar_snapshots(self) -> None:
+        while True:
+            await asyncio.sleep(INTERVALO_SNAPSHOT)
+            if self.diario.necesita_snapshot():
+                self.snapshot_en_curso = asyncio.create_task(self.guardar_snapshot())
+                try:
+                    # Al detener el servicio se espera la copia en curso, no se la interrumpe
+                    await asyncio.shield(self.snapshot_en_curso)
+                except Exception:
+                    registro.exception("No se pudo guardar la copia completa de los pedidos.")
+                    return
+
+    def leer(self, solicitud: dict) -> dict:
+        op: str = solicitud["op"]
+        if op == "leer":
+            nro_pedido: str = str(solicitud.get("nro"))
+            if nro_pedido not in self.pedidos:
+                raise ValueError(f"No existe ningún pedido con el número {nro_pedido!r}.")
+            return {"nro": nro_pedido, "pedido": self.pedidos[nro_pedido].a_dict()}
+        if op == "totales":
+            return {"ciudad": solicitud.get("ciudad"),
+                    "articulos": obtener_articulos_enviados(self.pedidos, str(solicitud.get("ciudad")))}
+        filtros: dict = {campo: solicitud.get(campo) for campo in ("enviado", "ciudad", "desde", "hasta")}
+        pagina, cursor = obtener_pagina(self.pedidos, solicitud.get("despues_de"),
+                                        int(solicitud.get("limite") or TAMANIO_PAGINA), **filtros)
+        return {"pedidos": [{"nro": nro_pedido, **pedido.a_dict()} for nro_pedido, pedido in pagina],
+                "cursor": cursor}
+
+    async def escribir(self, solicitud: dict) -> dict:
+        if solicitud.get("op") == "crear" and solicitud.get("nro") is None:
+            async with self.bloqueo_numeracion:
+                while str(self.proximo_nro) in self.pedidos:
+                    self.proximo_nro += 1
+                solicitud = {**solicitud, "nro": str(self.proximo_nro)}
+        if solicitud.get("nro") is None:
+            raise ValueError("Falta el número de pedido.")
+        nro_pedido: str = str(solicitud["nro"])
+        bloqueo: asyncio.Lock = self.obtener_bloqueo(nro_pedido)
+        try:
+            async with bloqueo:
+                aplicar(self.pedidos, solicitud)
+                await self.confirmar()
+        finally:
+            self.liberar_bloqueo(nro_pedido)
+        return {"nro": nro_pedido}
+
+    async def procesar(self, linea: bytes) -> dict:
+        try:
+            solicitud = json.loads(linea)
+            if not isinstance(solicitud, dict):
+                raise ValueError("La solicitud debe ser un objeto JSON.")
+            if solicitud.get("op") in OPERACIONES_LECTURA:
+                return {"ok": True, **self.leer(solicitud)}
+            return {"ok": True, **await self.escribir(solicitud)}
+        except (TypeError, ValueError, OSError) as error:
+            return {"ok": False, "error": str(error)}
+        except Exception as error:
+            # Un error inesperado se informa a quien hizo la solicitud y no corta la conexión
+            registro.exception("Error inesperado al procesar la solicitud %r.", linea)
+            return {"ok": False, "error": f"Error interno: {error}"}
+
+    async def atender(self, lector: asyncio.StreamReader, escritor: asyncio.StreamWriter) -> None:
+        try:
+            while True:
+                linea: bytes = await lector.readline()
+                if not linea:
+                    break
+                if linea.strip() == b'':
+                    continue
+                respuesta: dict = await self.procesar(linea)
+                escritor.write(json.dumps(respuesta, ensure_ascii=False).encode('utf-8') + b'\n')
+                await escritor.drain()
+        except (ConnectionError, asyncio.LimitOverrunError, ValueError):
+            pass
+        finally:
+            escritor.close()
+
+    async def iniciar(self, host: str = HOST, puerto: int = PUERTO) -> asyncio.AbstractServer:
+        if self.diario is not None:
+            self.tarea_confirmacion = asyncio.create_task(self.bajar_diario())
+            self.tarea_snapshot = asyncio.create_task(self.guardar_snapshots())
+        return await asyncio.start_server(self.atender, host, puerto, limit=LIMITE_LINEA)
+
+    async def detener(self, servidor: asyncio.AbstractServer) -> None:
+        servidor.close()
+        await servidor.wait_closed()
+        if self.tarea_snapshot is not None:
+            self.tarea_snapshot.cancel()
+        if self.snapshot_en_curso is not None and not self.snapshot_en_curso.done():
+            await asyncio.wait([self.snapshot_en_curso])
+        if self.tarea_confirmacion is not None:
+            self.tarea_confirmacion.cancel()
+
+
+async def servir(carpeta: str, host: str = HOST, puerto: int = PUERTO) -> None:
+    pedidos, diario = abrir_pedidos(carpeta)
+    servicio: Servicio = Servicio(pedidos, diario)
+    servidor = await servicio.iniciar(host, puerto)
+    print(f"\n\t\tAtendiendo pedidos en {host}:{puerto}, {len(pedidos)} pedidos cargados.")
+    try:
+        await servidor.serve_forever()
+    finally:
+        await servicio.detener(servidor)
+        diario.cerrar()
+
+
+def iniciar_servicio():
+    parser = argparse.ArgumentParser(description='Servicio local de pedidos.')
+    parser.add_argument('--datos', default=CARPETA_DATOS, help='carpeta de los datos guardados')
+    parser.add_argument('--puerto', type=int, default=PUERTO)
+    args = parser.parse_args()
+    logging.basicConfig(format='%(asctime)s %(levelname)s %(message)s')
+    try:
+        asyncio.run(servir(args.datos, HOST, args.puerto))
+    except KeyboardInterrupt:
+        print("\n\t\tServicio detenido.")
+
+
+if __name__ == '__main__':
+    iniciar_servicio()
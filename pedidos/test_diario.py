@@ -0,0 +1,150 @@
+import os
+import random
+import tempfile
+import unittest
+from datetime import date
+from agregados import comparar, recalcular
+from diario import ARCHIVO_DIARIO_ANTERIOR, ARCHIVO_SNAPSHOT
+from exportar import cumple_filtros, seleccionar
+from generador import generar_csv
+from indices import ordenar
+from lotes import crear, eliminar, enviar, modificar, poner_cantidad
+from main import abrir_pedidos, leer_pedidos, obtener_precio
+
+LINEAS: int = 3000
+CAMBIOS_POR_RONDA: int = 600
+# Bastante menos que los cambios de una ronda, así cada ronda guarda varias copias completas
+SNAPSHOT_CADA: int = 150
+
+
+class TestDiario(unittest.TestCase):
+    """Cambios al azar sobre pedidos guardados, comparados con una copia en diccionarios después de guardar copias
+    completas y de reabrir los pedidos: contenido, listados con filtros y cursor, y totales."""
+
+    def setUp(self):
+        self.carpeta = tempfile.TemporaryDirectory()
+        self.origen: str = os.path.join(self.carpeta.name, "pedidos.csv")
+        self.datos: str = os.path.join(self.carpeta.name, "datos")
+        generar_csv(self.origen, LINEAS)
+        self.abrir()
+        self.esperados: dict = {nro_pedido: pedido.a_dict() for nro_pedido, pedido in self.pedidos.items()}
+        self.ciudades: list[str] = sorted({pedido["ciudad"] for pedido in self.esperados.values()})
+
+    def tearDown(self):
+        self.diario.cerrar()
+        self.carpeta.cleanup()
+
+    def abrir(self) -> None:
+        self.pedidos, self.diario = abrir_pedidos(self.datos, self.origen)
+        self.diario.snapshot_cada = SNAPSHOT_CADA
+
+    def reabrir(self) -> None:
+        self.diario.cerrar()
+        self.abrir()
+
+    def cambiar(self, generador: random.Random, nros_pedido: list[str]) -> None:
+        nro_pedido: str = generador.choice(nros_pedido)
+        if nro_pedido not in self.esperados:
+            return
+        eleccion: float = generador.random()
+        if eleccion < 0.3:
+            poner_cantidad(self.pedidos, nro_pedido, "568", "negro", generador.randint(1, 50))
+        elif eleccion < 0.5:
+            if not self.esperados[nro_pedido]["enviado"]:
+                enviar(self.pedidos, nro_pedido)
+        elif eleccion < 0.6:
+            eliminar(self.pedidos, nro_pedido)
+            del self.esperados[nro_pedido]
+            return
+        elif eleccion < 0.8:
+            modificar(self.pedidos, nro_pedido, {"ciudad": generador.choice(self.ciudades)})
+        else:
+            nuevo: str = crear(self.pedidos, {**self.esperados[nro_pedido], "fecha": "01/02/2021"})
+            nros_pedido.append(nuevo)
+            self.esperados[nuevo] = self.pedidos[nuevo].a_dict()
+        self.esperados[nro_pedido] = self.pedidos[nro_pedido].a_dict()
+
+    def verificar(self) -> None:
+        self.assertEqual(len(self.pedidos), len(self.esperados))
+        self.assertEqual({nro_pedido: pedido.a_dict() for nro_pedido, pedido in self.pedidos.items()},
+                         self.esperados)
+        for filtros in [{}, {"enviado": True}, {"ciudad": self.ciudades[0]},
+                        {"desde": date(2019, 1, 1), "hasta": date(2019, 6, 30)},
+                        {"enviado": False, "ciudad": self.ciudades[-1], "desde": date(2020, 1, 1)}]:
+            esperados: list[str] = ordenar(nro_pedido for nro_pedido, pedido in self.esperados.items()
+                                           if cumple_filtros(pedido, **filtros))
+            self.assertEqual(list(seleccionar(self.pedidos, **filtros)), esperados, filtros)
+            if len(esperados) > 5:
+                self.assertEqual(list(seleccionar(self.pedidos, despues_de=esperados[4], **filtros)),
+                                 esperados[5:], filtros)
+        self.assertEqual(comparar(self.pedidos.agregados, recalcular(self.pedidos, obtener_precio)), [])
+
+    def test_cambios_copias_y_reaperturas(self):
+        generador: random.Random = random.Random(1)
+        nros_pedido: list[str] = list(self.esperados)
+        for _ in range(3):
+            for _ in range(CAMBIOS_POR_RONDA):
+                self.cambiar(generador, nros_pedido)
+            self.verificar()
+            self.reabrir()
+            self.verificar()
+
+    def test_cambios_durante_la_copia(self):
+        # Como en el servicio: la copia se escribe mientras el almacén sigue cambiando
+        generador: random.Random = random.Random(3)
+        nros_pedido: list[str] = list(self.esperados)
+        self.diario.solo_escribir = True
+        for _ in range(3):
+            copia, sec = self.diario.preparar_snapshot()
+            for _ in range(SNAPSHOT_CADA):
+                self.cambiar(generador, nros_pedido)
+            self.diario.escribir_snapshot(copia, sec)
+            for _ in range(SNAPSHOT_CADA // 2):
+                self.cambiar(generador, nros_pedido)
+            self.diario.terminar_snapshot()
+            self.verificar()
+        self.reabrir()
+        self.verificar()
+
+    def test_copia_sin_terminar(self):
+        generador: random.Random = random.Random(2)
+        nros_pedido: list[str] = list(self.esperados)
+        for _ in range(SNAPSHOT_CADA // 2):
+            self.cambiar(generador, nros_pedido)
+        # El programa se corta mientras escribe la copia: quedan la copia vieja y los dos diarios
+        self.diario.solo_escribir = True
+        self.diario.preparar_snapshot()
+        for _ in range(SNAPSHOT_CADA // 2):
+            self.cambiar(generador, nros_pedido)
+        self.assertTrue(os.path.exists(os.path.join(self.datos, ARCHIVO_DIARIO_ANTERIOR)))
+        self.reabrir()
+        self.assertFalse(os.path.exists(os.path.join(self.datos, ARCHIVO_DIARIO_ANTERIOR)))
+        self.verificar()
+        self.diario.guardar_snapshot()
+        self.reabrir()
+        self.verificar()
+
+    def test_carga_desordenada(self):
+        # Los índices se arman de una vez al terminar la carga, tienen que quedar ordenados igual
+        with open(self.origen, encoding='utf-8') as archivo:
+            encabezado, *lineas = archivo.readlines()
+        lineas.sort(key=lambda linea: int(linea.split(",", 1)[0]) % 7)
+        pedidos = leer_pedidos([encabezado, *lineas])
+        ordenados = leer_pedidos([encabezado, *sorted(lineas, key=lambda linea: int(linea.split(",", 1)[0]))])
+        self.assertEqual(pedidos.a_dict(), ordenados.a_dict())
+        for campo, valor in [(None, None), ("enviado", False), ("ciudad", self.ciudades[0]), ("fecha", "01/02/2019")]:
+            self.assertEqual(pedidos.indices.obtener(campo, valor), ordenados.indices.obtener(campo, valor), campo)
+        self.assertEqual(pedidos.indices.fechas, ordenados.indices.fechas)
+
+    def test_otra_version(self):
+        self.diario.cerrar()
+        ruta: str = os.path.join(self.datos, ARCHIVO_SNAPSHOT)
+        with open(ruta, 'r+b') as archivo:
+            archivo.seek(4)
+            archivo.write((1).to_bytes(2, 'little'))
+        with self.assertRaises(ValueError):
+            abrir_pedidos(self.datos, self.origen)
+
+
+if __name__ == '__main__':
+    unittest.main()
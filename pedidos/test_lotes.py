@@ -0,0 +1,67 @@
+import os
+import tempfile
+import unittest
+from diario import ARCHIVO_DIARIO
+from lotes import aplicar_lote
+from main import abrir_pedidos
+from validaciones import CANTIDAD_MAXIMA
+
+LINEAS_CSV: list[str] = [
+    "Nro. Pedido, Fecha, Cliente, Ciudad, Provincia, Cod. Artículo, Color, Cantidad, Descuento",
+    "1,01/11/2021,Juan Alvarez,Villa María,Córdoba,1334,Azul,36,5",
+    "1,01/11/2021,Juan Alvarez,Villa María,Córdoba,568,Negro,6,5",
+    "2,02/11/2021,Ana Gomez,Rosario,Santa Fe,568,Azul,10,0",
+]
+
+
+class TestOperacionInvalida(unittest.TestCase):
+    """Una operación rechazada no cambia los pedidos, los índices ni el diario, ni siquiera al reabrirlos."""
+
+    def setUp(self):
+        self.carpeta = tempfile.TemporaryDirectory()
+        self.pedidos, self.diario = abrir_pedidos(self.carpeta.name, LINEAS_CSV)
+        # Un cambio válido deja un registro en el diario, que no debe perderse
+        resultado: dict = aplicar_lote(self.pedidos, [{"op": "enviar", "nro": "2"}])
+        self.assertEqual(resultado["errores"], [])
+
+    def tearDown(self):
+        self.diario.cerrar()
+        self.carpeta.cleanup()
+
+    def leer_diario(self) -> str:
+        self.diario.sincronizar()
+        with open(os.path.join(self.carpeta.name, ARCHIVO_DIARIO), encoding='utf-8') as archivo:
+            return archivo.read()
+
+    def test_cantidad_fuera_de_rango(self):
+        antes: dict = self.pedidos.a_dict()
+        diario_antes: str = self.leer_diario()
+        resultado: dict = aplicar_lote(self.pedidos, [
+            {"op": "poner_cantidad", "nro": "1", "codigo": "1334", "color": "azul", "cantidad": 2 ** 33},
+            {"op": "poner_cantidad", "nro": "1", "codigo": "568", "color": "negro", "cantidad": CANTIDAD_MAXIMA + 1},
+            {"op": "crear", "nro": "3", "pedido": {
+                "fecha": "03/11/2021", "cliente": "Luis Diaz", "ciudad": "Rosario", "provincia": "Santa Fe",
+                "productos": {"568": {"azul": {"cantidad": 2 ** 40}}}, "descuento": 0}},
+        ])
+        self.assertEqual(resultado["aplicadas"], 0)
+        self.assertEqual([error["linea"] for error in resultado["errores"]], [1, 2, 3])
+        self.assertEqual(self.pedidos.a_dict(), antes)
+        self.assertEqual(self.pedidos.indices.obtener("ciudad", "Villa María"), ["1"])
+        self.assertEqual(self.pedidos.indices.obtener("enviado", True), ["2"])
+        self.assertEqual(self.leer_diario(), diario_antes)
+
+        self.diario.cerrar()
+        self.pedidos, self.diario = abrir_pedidos(self.carpeta.name, [])
+        self.assertEqual(self.pedidos.a_dict(), antes)
+
+    def test_cantidad_maxima(self):
+        resultado: dict = aplicar_lote(self.pedidos, [
+            {"op": "poner_cantidad", "nro": "1", "codigo": "1334", "color": "azul", "cantidad": CANTIDAD_MAXIMA}])
+        self.assertEqual(resultado["errores"], [])
+        self.diario.cerrar()
+        self.pedidos, self.diario = abrir_pedidos(self.carpeta.name, [])
+        self.assertEqual(self.pedidos["1"]["productos"]["1334"]["azul"]["cantidad"], CANTIDAD_MAXIMA)
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,127 @@
+from datetime import datetime
+from indices import FORMATO_FECHA
+
+CODIGO_BOTELLA: str = "1334"
+CODIGO_VASO: str = "568"
+# Colores disponibles de cada artículo, como se muestran en el menú
+COLORES_BOTELLA: list[str] = ["Verde", "Rojo", "Azul", "Negro", "Amarillo"]
+COLORES_VASO: list[str] = ["Negro", "Azul"]
+# Colores de cada código de artículo, en minúsculas como se guardan en los pedidos
+COLORES_POR_CODIGO: dict = {
+    CODIGO_BOTELLA: [color.lower() for color in COLORES_BOTELLA],
+    CODIGO_VASO: [color.lower() for color in COLORES_VASO]
+}
+DESCUENTO_MINIMO: float = 0
+DESCUENTO_MAXIMO: float = 100
+# Las cantidades se guardan como enteros sin signo de 32 bits, en memoria y en el formato binario
+CANTIDAD_MAXIMA: int = 2 ** 32 - 1
+
+
+def validar_fecha(fecha: str) -> str:
+    """Verifica que una fecha respete el formato dd/mm/yyyy.
+
+    Args:
+        fecha (str): Fecha a verificar.
+
+    Returns:
+        str: La misma fecha.
+
+    Raises:
+        ValueError: Si la fecha no es válida.
+    """
+    if not isinstance(fecha, str):
+        raise ValueError(f"La fecha {fecha!r} debe respetar el formato dd/mm/yyyy.")
+    try:
+        datetime.strptime(fecha, FORMATO_FECHA)
+    except ValueError:
+        raise ValueError(f"La fecha {fecha!r} debe respetar el formato dd/mm/yyyy.") from None
+    return fecha
+
+
+def validar_cantidad(valor) -> int:
+    """Verifica que un valor sea un número entero positivo, hasta CANTIDAD_MAXIMA.
+
+    Args:
+        valor: Número o texto a verificar.
+
+    Returns:
+        int: El valor como número entero.
+
+    Raises:
+        ValueError: Si el valor no es un número entero positivo o supera CANTIDAD_MAXIMA.
+    """
+    if isinstance(valor, bool) or not (isinstance(valor, int) or (isinstance(valor, str) and valor.strip().isdigit())):
+        raise ValueError(f"La cantidad {valor!r} debe ser un número entero positivo.")
+    cantidad: int = int(valor)
+    if cantidad <= 0:
+        raise ValueError(f"La cantidad {valor!r} debe ser un número entero positivo.")
+    if cantidad > CANTIDAD_MAXIMA:
+        raise ValueError(f"La cantidad {valor!r} no puede superar {CANTIDAD_MAXIMA}.")
+    return cantidad
+
+
+def validar_descuento(valor) -> float:
+    """Verifica que un descuento esté entre 0 y 100, inclusive.
+
+    Args:
+        valor: Número o texto a verificar.
+
+    Returns:
+        float: El descuento como número.
+
+    Raises:
+        ValueError: Si el descuento no es un número entre 0 y 100.
+    """
+    try:
+        if isinstance(valor, bool):
+            raise ValueError
+        descuento: float = float(valor)
+    except (TypeError, ValueError):
+        raise ValueError(f"El descuento {valor!r} debe ser un número entre 0 y 100 (inclusive).") from None
+    if not DESCUENTO_MINIMO <= descuento <= DESCUENTO_MAXIMO:
+        raise ValueError(f"El descuento {valor!r} debe ser un número entre 0 y 100 (inclusive).")
+    return descuento
+
+
+def validar_color(codigo: str, color: str) -> str:
+    """Verifica que un artículo exista y se fabrique en determinado color.
+
+    Args:
+        codigo (str): Código del artículo.
+        color (str): Color, sin importar mayúsculas.
+
+    Returns:
+        str: El color en minúsculas.
+
+    Raises:
+        ValueError: Si el código o el color no son válidos.
+    """
+    if codigo not in COLORES_POR_CODIGO:
+        raise ValueError(f"No existe un artículo con el código {codigo!r}.")
+    if not isinstance(color, str) or color.lower() not in COLORES_POR_CODIGO[codigo]:
+        raise ValueError(f"El artículo cod-{codigo} no se fabrica en color {color!r}.")
+    return color.lower()
+
+
+def validar_productos(productos: dict) -> dict:
+    """Verifica los artículos de un pedido con la estructura {código: {color: {"cantidad": n}}}.
+
+    Args:
+        productos (dict): Artículos a verificar.
+
+    Returns:
+        dict: Los artículos con los colores en minúsculas y las cantidades como números enteros.
+
+    Raises:
+        ValueError: Si algún código, color o cantidad no es válido, o si no hay artículos.
+    """
+    if not isinstance(productos, dict) or len(productos) == 0:
+        raise ValueError("El pedido debe tener al menos un artículo.")
+    validados: dict = {}
+    for codigo, colores in productos.items():
+        if not isinstance(colores, dict) or len(colores) == 0:
+            raise ValueError(f"El artículo cod-{codigo} debe tener al menos un color.")
+        for color, item in colores.items():
+            cantidad = item.get("cantidad") if isinstance(item, dict) else None
+            validados.setdefault(codigo, {})[validar_color(codigo, color)] = {"cantidad": validar_cantidad(cantidad)}
+    return validados